@@ -1,10 +1,12 @@
+import os
 import pandas as pd
 import joblib
 import re
 import unicodedata
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
@@ -21,20 +23,71 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Padrões de normalização compilados uma única vez
+# Gírias e expressões comuns do dataset, agrupadas pela substituição.
+# Uma única alternação percorre o texto uma vez em vez de uma vez por gíria.
+_GIRIA_GROUPS = {
+    'bom': r'massa|top|show|arretado',
+    'ruim': r'aff|vish',
+    'riso': r'rs|kkk+|haha+',  # Remove risos
+    'voce': r'vc',
+    'para': r'pra|pro',
+    'nao_e': r'ne',
+    'esta': r'ta'
+}
+_GIRIA_REPLACEMENTS = {
+    'bom': 'bom',
+    'ruim': 'ruim',
+    'riso': '',
+    'voce': 'voce',
+    'para': 'para',
+    'nao_e': 'nao e',
+    'esta': 'esta'
+}
+# As fronteiras de palavra (\b) ficam fora da alternação, compartilhadas por todos os grupos:
+# o motor testa a fronteira uma vez por posição em vez de uma vez por alternativa
+_GIRIA_RE = re.compile(r'\b(?:' + '|'.join(f'(?P<{nome}>{padrao})' for nome, padrao in _GIRIA_GROUPS.items()) + r')\b')
+
+def _replace_giria(match: re.Match) -> str:
+    return _GIRIA_REPLACEMENTS[match.lastgroup]
+
+# Tabela de remoção de acentos: mapeia cada letra latina acentuada para sua
+# letra base e descarta marcas combinantes soltas. Para as letras latinas
+# (U+00C0-U+024F) equivale a decompor com NFD e remover as marcas, mas roda em
+# uma única chamada str.translate; os demais caracteres acentuados ficam para
+# _strip_combining_marks.
+_ACCENT_TABLE = {
+    codigo: unicodedata.normalize('NFD', chr(codigo))[0]
+    for codigo in range(0x00C0, 0x0250)
+    if unicodedata.normalize('NFD', chr(codigo)) != chr(codigo)
+}
+_ACCENT_TABLE.update(dict.fromkeys(range(0x0300, 0x0370)))
+
+def _strip_combining_marks(text: str) -> str:
+    """Caminho geral da remoção de acentos: decompõe com NFD e descarta as marcas (categoria Mn)."""
+    return ''.join(char for char in unicodedata.normalize('NFD', text) if unicodedata.category(char) != 'Mn')
+
+_PUNCT_RE = re.compile(r'[^\w\s.!?,-]')
+_MULTI_PUNCT_RE = re.compile(r'([.!?])\1+')  # '..', '!!!', '??' -> um único sinal
+_ISOLATED_NUMBER_RE = re.compile(r'\b\d+\b(?!\w)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 logger.info("Iniciando o treinamento do modelo de sentimento...")
 
 # 1. Carregar dados rotulados
-df = pd.read_csv('training_feedback.csv')
+#    O leitor do pyarrow faz o parsing em paralelo e já entrega colunas de texto
+#    do tipo string[pyarrow], sem necessidade de conversão posterior.
+df = pd.read_csv('training_feedback.csv', engine='pyarrow', dtype={'text': 'string[pyarrow]'})
 
 # Remove linhas com dados ausentes, se houver
 df.dropna(subset=['text', 'sentiment'], inplace=True)
 
-# Garante que o texto é string
-df['text'] = df['text'].astype(str)
-
-def normalize_text(text):
+def normalize_texts(texts: pd.Series) -> pd.Series:
     """
-    Normaliza texto para melhorar a acurácia do modelo de sentimento.
+    Normaliza textos para melhorar a acurácia do modelo de sentimento.
+    
+    Opera sobre a coluna inteira com o acessor .str do pandas, em vez de
+    chamar uma função Python por linha.
     
     Aplica:
     - Conversão para minúsculas
@@ -45,63 +98,45 @@ def normalize_text(text):
     - Padronização de gírias comuns
     """
     # Converte para minúsculas
-    text = text.lower()
+    texts = texts.str.lower()
     
     # Remove acentos mantendo caracteres especiais do português
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    texts = texts.str.translate(_ACCENT_TABLE)
     
-    # Padroniza gírias e expressões comuns do dataset
-    girias_map = {
-        r'\bmassa\b': 'bom',
-        r'\btop\b': 'bom', 
-        r'\bshow\b': 'bom',
-        r'\barretado\b': 'bom',
-        r'\baff\b': 'ruim',
-        r'\bvish\b': 'ruim',
-        r'\brs\b': '',  # Remove risos
-        r'\bkkk+\b': '',  # Remove risos
-        r'\bhaha+\b': '',  # Remove risos
-        r'\bvc\b': 'voce',
-        r'\bpra\b': 'para',
-        r'\bpro\b': 'para',
-        r'\bne\b': 'nao e',
-        r'\bta\b': 'esta'
-    }
+    # Caracteres fora da tabela (ex.: 'ạ', 'ά', 'ẽ'): só os textos que ainda têm algo
+    # fora do ASCII passam pelo caminho geral NFD + remoção das marcas
+    not_ascii = ~texts.str.isascii()
+    if not_ascii.any():
+        texts = texts.mask(not_ascii, texts[not_ascii].map(_strip_combining_marks))
     
-    for padrao, substituicao in girias_map.items():
-        text = re.sub(padrao, substituicao, text)
+    # Padroniza gírias e expressões comuns do dataset
+    texts = texts.str.replace(_GIRIA_RE, _replace_giria, regex=True)
     
     # Remove pontuação excessiva (mantém apenas . , ! ?)
-    text = re.sub(r'[^\w\s.!?,-]', ' ', text)
+    texts = texts.str.replace(_PUNCT_RE, ' ', regex=True)
     
     # Normaliza pontuação repetida
-    text = re.sub(r'[.]{2,}', '.', text)
-    text = re.sub(r'[!]{2,}', '!', text)
-    text = re.sub(r'[?]{2,}', '?', text)
+    texts = texts.str.replace(_MULTI_PUNCT_RE, r'\1', regex=True)
     
     # Remove números isolados (mantém em contexto como "24h")
-    text = re.sub(r'\b\d+\b(?!\w)', '', text)
+    texts = texts.str.replace(_ISOLATED_NUMBER_RE, '', regex=True)
     
-    # Normaliza espaços múltiplos
-    text = re.sub(r'\s+', ' ', text)
+    # Normaliza espaços múltiplos e remove espaços no início e fim
+    texts = texts.str.replace(_WHITESPACE_RE, ' ', regex=True).str.strip()
     
-    # Remove espaços no início e fim
-    text = text.strip()
-    
-    return text
+    return texts
 
 # Aplica normalização nos textos
 logger.info("Normalizando textos...")
-df['text_original'] = df['text'].copy()  # Salva originais para comparação
-df['text'] = df['text'].apply(normalize_text)
+sample_originals = df['text'].head(3).tolist()  # Apenas os exemplos do log, sem copiar a coluna inteira
+df['text'] = normalize_texts(df['text'])
 logger.info("Normalização concluída.")
 
 # Log alguns exemplos da normalização
 logger.info("Exemplos de normalização:")
-for i in range(min(3, len(df))):
-    logger.info(f"  Original: '{df.iloc[i]['text_original'][:50]}...'")
-    logger.info(f"  Normalizado: '{df.iloc[i]['text'][:50]}...'")
+for original, normalized in zip(sample_originals, df['text'].head(3).tolist()):
+    logger.info(f"  Original: '{original[:50]}...'")
+    logger.info(f"  Normalizado: '{normalized[:50]}...'")
 
 logger.info(f"Total de {len(df)} feedbacks carregados para treinamento.")
 
@@ -110,29 +145,43 @@ X = df['text']
 y = df['sentiment']
 
 # 3. Dividir dados para treino e teste (80% treino, 20% teste)
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+#    A estratificação usa os rótulos codificados como inteiros (int8), mais baratos de agrupar
+#    que strings. O pipeline continua treinando com os rótulos em texto, que são o que o
+#    scheduler espera receber nas predições.
+sentiment_labels = pd.Categorical(y)
+y_codes = sentiment_labels.codes.astype(np.int8)
+X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y_codes)
 
 # 4. Criar o pipeline de Machine Learning
-#    Etapa 1: Vetoriza o texto. Usamos bigramas (ngram_range) para capturar expressões como "muito bom".
-#    Etapa 2: Treina um classificador de Regressão Logística, que é leve e eficaz.
-#    Nota: Com textos normalizados, podemos usar configurações mais refinadas no TfidfVectorizer
+#    Etapa 1: Vetoriza o texto por hashing. Usamos bigramas (ngram_range) para capturar expressões como "muito bom".
+#             O HashingVectorizer não guarda vocabulário: cada token vira um índice fixo em uma única passada.
+#    Etapa 2: Aplica o peso TF-IDF sobre as contagens.
+#    Etapa 3: Treina um classificador de Regressão Logística, que é leve e eficaz (um contra todos, em paralelo).
+#    Nota: A normalização fica fora do pipeline de propósito. O scheduler aplica a mesma
+#    normalização antes de predizer, e as gírias só casam depois de minúsculas e sem acentos.
+#    Por isso o vetorizador não repete essas etapas (strip_accents=None, lowercase=False)
+#    e o texto é percorrido uma única vez.
 sentiment_pipeline = Pipeline([
-    ('tfidf', TfidfVectorizer(
+    ('hash', HashingVectorizer(
         ngram_range=(1, 2),          # Unigramas e bigramas
-        max_df=0.85,                 # Ignora termos muito frequentes (mais restritivo)
-        min_df=2,                    # Palavra deve aparecer pelo menos 2 vezes
-        max_features=5000,           # Limita vocabulário para evitar overfitting
+        n_features=2**18,            # Espaço de hashing amplo para evitar colisões
+        alternate_sign=False,        # Mantém contagens não negativas para o TF-IDF
+        norm=None,                   # Normalização feita pelo TfidfTransformer
         strip_accents=None,          # Já fizemos normalização manual
         lowercase=False,             # Já convertemos para minúsculas
         stop_words=None,             # Não remove stopwords automaticamente (algumas podem ser úteis para sentimento)
-        token_pattern=r'\b[a-z]{2,}\b'  # Tokens de pelo menos 2 letras
+        token_pattern=r'\b[a-z]{2,}\b',  # Tokens de pelo menos 2 letras
+        dtype=np.float32             # Metade da memória da matriz esparsa; o liblinear aceita float32
     )),
-    ('clf', LogisticRegression(
-        random_state=42, 
-        solver='liblinear', 
-        multi_class='ovr',
-        C=1.0,                       # Regularização padrão
-        max_iter=1000                # Mais iterações para convergência
+    ('tfidf', TfidfTransformer()),
+    ('clf', OneVsRestClassifier(
+        LogisticRegression(
+            random_state=42, 
+            solver='liblinear', 
+            C=1.0,                   # Regularização padrão
+            max_iter=1000            # Mais iterações para convergência
+        ),
+        n_jobs=-1                    # Treina um classificador por classe em paralelo
     ))
 ])
 
@@ -142,7 +191,9 @@ sentiment_pipeline.fit(X_train, y_train)
 
 # 6. Avaliar a performance com os dados de teste
 logger.info("\nAvaliação do modelo no conjunto de teste:")
-y_pred = sentiment_pipeline.predict(X_test)
+# Uma única passada pelo pipeline: as classes preditas saem das próprias probabilidades
+y_proba = sentiment_pipeline.predict_proba(X_test)
+y_pred = sentiment_pipeline.classes_[y_proba.argmax(axis=1)]
 
 # Calcular métricas detalhadas
 accuracy = accuracy_score(y_test, y_pred)
@@ -164,7 +215,6 @@ logger.info(f"Classes: {sentiment_pipeline.classes_}")
 logger.info(f"Matriz:\n{cm}")
 
 # Análise de probabilidades para verificar confiança
-y_proba = sentiment_pipeline.predict_proba(X_test)
 max_probabilities = np.max(y_proba, axis=1)
 avg_confidence = np.mean(max_probabilities)
 min_confidence = np.min(max_probabilities)
@@ -188,8 +238,15 @@ print(classification_report(y_test, y_pred))
 
 # 7. Salvar o pipeline treinado em um arquivo
 #    Este arquivo é tudo o que você precisa para fazer predições no seu microserviço.
+#    Salvo sem compressão e com o protocolo 5 do pickle: os arrays NumPy ficam no arquivo
+#    como estão, e o serviço os carrega com memory-mapping (mmap_mode='r'), compartilhando
+#    as mesmas páginas entre processos. Grava em um arquivo temporário e substitui o modelo
+#    de uma vez, para não alterar um arquivo que esteja mapeado por um serviço em execução.
+#    Não comprimir (lz4/zlib) é proposital: o joblib não consegue mapear um arquivo comprimido,
+#    e o modelo fica com ~7 MB em disco em vez de ~110 KB em troca da carga sem cópia.
 model_filename = 'sentiment_model.joblib'
-joblib.dump(sentiment_pipeline, model_filename)
+joblib.dump(sentiment_pipeline, model_filename + '.tmp', compress=0, protocol=5)
+os.replace(model_filename + '.tmp', model_filename)
 
 logger.info(f"\nTreinamento concluído! Modelo salvo como '{model_filename}'")
 logger.info(f"Acurácia final: {accuracy:.4f} ({accuracy*100:.2f}%)")
@@ -8,20 +8,75 @@ específica de academias e aplicações fitness, incluindo:
 - Padrões realísticos de receita e despesas
 """
 
+import calendar
+import csv
+import io
 import uuid
 import sys
 import os
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
-import random
+import numpy as np
 
 # Adiciona o diretório pai ao path para importar os módulos
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import insert
 from sqlmodel import Session
 from database.db_connect import engine
 from model.models import Profit
 
+# Sazonalidade específica para negócio fitness, indexada pelo número do mês
+# (a posição 0 não é usada)
+SEASONAL_FACTORS = np.array([
+    1.0,
+    1.4,   # Janeiro - Alta de matrículas (resoluções de ano novo)
+    1.2,   # Fevereiro - Continuação do impulso de janeiro
+    1.1,   # Março - Estabilização
+    1.0,   # Abril - Normal
+    1.0,   # Maio - Normal
+    0.8,   # Junho - Queda por causa do frio
+    1.1,   # Julho - Férias escolares, leve alta de matrículas
+    1.0,   # Agosto - Volta gradual das atividades
+    1.1,   # Setembro - Volta às atividades normais
+    1.3,   # Outubro - Início da busca por forma para o verão
+    1.2,   # Novembro - Black Friday (promoções), mantém alta
+    0.9    # Dezembro - Redução geral (festas e férias)
+])
+
+# Colunas gravadas via COPY, na ordem do CSV gerado
+PROFIT_COLUMNS = ("id", "period_start", "period_end", "total_revenue",
+                  "total_expenses", "net_profit", "profit_margin", "created_at")
+
+# A partir deste volume (PostgreSQL via psycopg2) os registros são gravados com COPY
+COPY_THRESHOLD = 1000
+
+def copy_profits(profits_data: list[dict]) -> None:
+    """
+    Grava os registros de lucros com COPY FROM STDIN (psycopg2)
+    
+    Args:
+        profits_data: Registros de lucros no formato de dicionário
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([profit[column] for column in PROFIT_COLUMNS] for profit in profits_data)
+    buffer.seek(0)
+    
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.copy_expert(
+            f"COPY {Profit.__table__.name} ({', '.join(PROFIT_COLUMNS)}) FROM STDIN WITH CSV",
+            buffer
+        )
+        raw_connection.commit()
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+
 def generate_sample_profit_data(months_back: int = 24) -> None:
     """
     Gera dados sintéticos de lucros mensais para negócio fitness
@@ -47,106 +102,101 @@ def generate_sample_profit_data(months_back: int = 24) -> None:
         growth_rate = 0.08  # 8% ao ano (crescimento orgânico)
         monthly_growth = growth_rate / 12
         
-        # Sazonalidade específica para negócio fitness
-        seasonal_factors = {
-            1: 1.4,   # Janeiro - Alta de matrículas (resoluções de ano novo)
-            2: 1.2,   # Fevereiro - Continuação do impulso de janeiro
-            3: 1.1,   # Março - Estabilização
-            4: 1.0,   # Abril - Normal
-            5: 1.0,   # Maio - Normal
-            6: 0.8,   # Junho - Queda por causa do frio
-            7: 1.1,   # Julho - Férias escolares, leve alta de matrículas
-            8: 1.0,   # Agosto - Volta gradual das atividades
-            9: 1.1,   # Setembro - Volta às atividades normais
-            10: 1.3,  # Outubro - Início da busca por forma para o verão
-            11: 1.2,  # Novembro - Black Friday (promoções), mantém alta
-            12: 0.9   # Dezembro - Redução geral (festas e férias)
-        }
+        # Datas dos períodos (lista Python; o restante é calculado em vetores NumPy)
+        dates = [start_date + relativedelta(months=i) for i in range(months_back)]
+        rng = np.random.default_rng()
+        
+        # Aplicar tendência de crescimento gradual
+        growth_factors = 1 + monthly_growth * np.arange(months_back)
+        
+        # Aplicar sazonalidade específica do fitness
+        months = np.fromiter((d.month for d in dates), dtype=np.intp, count=months_back)
+        seasonal = SEASONAL_FACTORS[months]
+        
+        # Variabilidade mais controlada para negócio fitness (±15%)
+        random_factors = rng.uniform(0.85, 1.15, months_back)
+        
+        # Calcular receitas com padrões de academia/fitness
+        revenues = base_revenue * growth_factors * seasonal * random_factors
+        
+        # Despesas variam menos que receitas (custos mais fixos)
+        expense_variability = rng.uniform(0.92, 1.08, months_back)  # ±8% de variação
+        expenses = base_expenses * growth_factors * expense_variability
+        
+        # Ajuste específico para meses de alta sazonalidade (mais custos operacionais)
+        expenses[seasonal > 1.2] *= 1.1  # Janeiro e Outubro: 10% mais custos operacionais
+        
+        # Garantir margem mínima positiva
+        expenses = np.where(revenues <= expenses, revenues * 0.85, expenses)  # Margem mínima de 15%
+        
+        net_profits = revenues - expenses
+        margins = np.divide(net_profits, revenues, out=np.zeros(months_back), where=revenues > 0) * 100
+        
+        # Emoji indicativo da sazonalidade de cada mês
+        season_emojis = np.select(
+            [seasonal >= 1.3, seasonal >= 1.1, seasonal <= 0.9],
+            ["🔥", "📈", "📉"],
+            default="📊"
+        )
         
         profits_data = []
+        report_lines = []
         
-        for i in range(months_back):
-            # Data do período
-            current_date = start_date + relativedelta(months=i)
-            period_start = current_date.replace(day=1)
+        for current_date, season_emoji, monthly_revenue, monthly_expenses, net_profit, profit_margin in zip(
+            dates, season_emojis.tolist(), revenues.tolist(), expenses.tolist(), net_profits.tolist(), margins.tolist()
+        ):
+            # Data do período (as datas já são geradas no primeiro dia de cada mês)
+            period_start = current_date
             
             # Último dia do mês
-            if current_date.month == 12:
-                period_end = date(current_date.year + 1, 1, 1) - relativedelta(days=1)
-            else:
-                period_end = date(current_date.year, current_date.month + 1, 1) - relativedelta(days=1)
-            
-            # Aplicar tendência de crescimento gradual
-            growth_factor = 1 + (monthly_growth * i)
-            
-            # Aplicar sazonalidade específica do fitness
-            seasonal_factor = seasonal_factors.get(current_date.month, 1.0)
-            
-            # Variabilidade mais controlada para negócio fitness (±15%)
-            random_factor = random.uniform(0.85, 1.15)
-            
-            # Calcular receitas com padrões de academia/fitness
-            monthly_revenue = base_revenue * growth_factor * seasonal_factor * random_factor
-            
-            # Despesas variam menos que receitas (custos mais fixos)
-            expense_variability = random.uniform(0.92, 1.08)  # ±8% de variação
-            monthly_expenses = base_expenses * growth_factor * expense_variability
-            
-            # Ajuste específico para meses de alta sazonalidade (mais custos operacionais)
-            if seasonal_factor > 1.2:  # Janeiro e Outubro
-                monthly_expenses *= 1.1  # 10% mais custos operacionais
-            
-            # Garantir margem mínima positiva
-            if monthly_revenue <= monthly_expenses:
-                monthly_expenses = monthly_revenue * 0.85  # Margem mínima de 15%
-            
-            net_profit = monthly_revenue - monthly_expenses
-            profit_margin = (net_profit / monthly_revenue) * 100 if monthly_revenue > 0 else 0
+            period_end = current_date.replace(day=calendar.monthrange(current_date.year, current_date.month)[1])
             
             # Criar registro
-            profit = Profit(
-                id=str(uuid.uuid4()),
-                period_start=period_start,
-                period_end=period_end,
-                total_revenue=round(monthly_revenue, 2),
-                total_expenses=round(monthly_expenses, 2),
-                net_profit=round(net_profit, 2),
-                profit_margin=round(profit_margin, 2),
-                created_at=datetime.now()
-            )
+            profit = {
+                "id": str(uuid.uuid4()),
+                "period_start": period_start,
+                "period_end": period_end,
+                "total_revenue": round(monthly_revenue, 2),
+                "total_expenses": round(monthly_expenses, 2),
+                "net_profit": round(net_profit, 2),
+                "profit_margin": round(profit_margin, 2),
+                "created_at": datetime.now()
+            }
             
             profits_data.append(profit)
             
-            # Adicionar emoji indicativo da sazonalidade
-            season_emoji = "🔥" if seasonal_factor >= 1.3 else "📈" if seasonal_factor >= 1.1 else "📉" if seasonal_factor <= 0.9 else "📊"
-            
-            print(f"📅 {period_start.strftime('%Y-%m')} {season_emoji}: Receita: ${monthly_revenue:,.2f}, "
-                  f"Despesas: ${monthly_expenses:,.2f}, Lucro: ${net_profit:,.2f} (Margem: {profit_margin:.1f}%)")
+            report_lines.append(f"📅 {period_start.strftime('%Y-%m')} {season_emoji}: Receita: ${monthly_revenue:,.2f}, "
+                                f"Despesas: ${monthly_expenses:,.2f}, Lucro: ${net_profit:,.2f} (Margem: {profit_margin:.1f}%)")
         
-        # Salvar no banco
+        # Relatório mensal impresso de uma só vez
+        print("\n".join(report_lines))
+        
+        # Salvar no banco (COPY para volumes grandes no PostgreSQL,
+        # senão um único INSERT com múltiplas linhas)
         try:
-            for profit in profits_data:
-                session.add(profit)
-            
-            session.commit()
+            if engine.dialect.driver == "psycopg2" and len(profits_data) >= COPY_THRESHOLD:
+                copy_profits(profits_data)
+            else:
+                session.execute(insert(Profit), profits_data)
+                session.commit()
             print(f"✅ {len(profits_data)} registros de lucros salvos com sucesso!")
             
             # Estatísticas detalhadas
-            avg_revenue = sum(p.total_revenue for p in profits_data) / len(profits_data)
-            avg_profit = sum(p.net_profit for p in profits_data) / len(profits_data)
-            avg_margin = sum(p.profit_margin for p in profits_data) / len(profits_data)
+            avg_revenue = sum(p["total_revenue"] for p in profits_data) / len(profits_data)
+            avg_profit = sum(p["net_profit"] for p in profits_data) / len(profits_data)
+            avg_margin = sum(p["profit_margin"] for p in profits_data) / len(profits_data)
             
             # Encontrar melhores e piores meses
-            best_month = max(profits_data, key=lambda x: x.net_profit)
-            worst_month = min(profits_data, key=lambda x: x.net_profit)
+            best_month = max(profits_data, key=lambda x: x["net_profit"])
+            worst_month = min(profits_data, key=lambda x: x["net_profit"])
             
             print(f"\n📊 Estatísticas dos dados fitness gerados:")
             print(f"   • Receita média mensal: ${avg_revenue:,.2f}")
             print(f"   • Lucro médio mensal: ${avg_profit:,.2f}")
             print(f"   • Margem de lucro média: {avg_margin:.1f}%")
-            print(f"   • Melhor mês: {best_month.period_start.strftime('%Y-%m')} (${best_month.net_profit:,.2f})")
-            print(f"   • Pior mês: {worst_month.period_start.strftime('%Y-%m')} (${worst_month.net_profit:,.2f})")
-            print(f"   • Período: {profits_data[0].period_start} até {profits_data[-1].period_end}")
+            print(f"   • Melhor mês: {best_month['period_start'].strftime('%Y-%m')} (${best_month['net_profit']:,.2f})")
+            print(f"   • Pior mês: {worst_month['period_start'].strftime('%Y-%m')} (${worst_month['net_profit']:,.2f})")
+            print(f"   • Período: {profits_data[0]['period_start']} até {profits_data[-1]['period_end']}")
             print(f"\n🏋️  Sazonalidade fitness aplicada:")
             print(f"   🔥 Picos: Janeiro (Resoluções), Outubro (Verão)")
             print(f"   📉 Baixas: Junho (Frio), Dezembro (Festas)")
@@ -1,11 +1,9 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+import asyncio
 from database.db_connect import create_db_and_tables
 from routes.routes import router as feedbacks_router
-from services.scheduler import start_ml_scheduler, stop_ml_scheduler
-from services.forecast_scheduler import start_forecast_scheduler, stop_forecast_scheduler
-from tests.run_tests import validate_sentiment_analysis 
-from database.seed_data import clear_test_data, create_test_feedbacks
+from services.scheduler import start_ml_scheduler, stop_ml_scheduler, setup_scheduler_logging, shutdown_scheduler_logging
 import os
 import logging
 
@@ -14,61 +12,100 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    logger.info("Iniciando FitCore AI Service...")
-    
-    # 1. Criar tabelas do banco de dados
-    create_db_and_tables()
-    logger.info("Banco de dados inicializado")
-    
-    # 2. Popular com dados de teste (seed_data)
-    logger.info("Executando seed_data...")
-    clear_test_data()
-    create_test_feedbacks()
-    logger.info("Dados de teste criados com sucesso!")
-    
-    # 3. Executar validação se solicitado via variável de ambiente
-    if os.getenv("RUN_VALIDATE_ON_STARTUP", "false").lower() == "true":
-        logger.info("Executando validacao de sentimentos...")
-        validate_sentiment_analysis()
+def env_flag(name: str, default: str = "false") -> bool:
+    """Lê uma variável de ambiente booleana ("true"/"false")"""
+    return os.getenv(name, default).lower() == "true"
+
+def log_validation_result(validation: asyncio.Future):
+    """Registra o fim da validação executada em segundo plano"""
+    error = validation.exception()
+    if error is not None:
+        logger.error(f"Erro na validacao de sentimentos: {error}")
+    else:
         logger.info("Validacao concluida")
-    
-    # 4. Iniciar agendadores (o ML scheduler vai processar os feedbacks criados)
-    logger.info("Iniciando agendadores...")
-    start_ml_scheduler()
-    start_forecast_scheduler()
-    logger.info("Agendadores ativos")
-    
-    logger.info("FitCore AI Service iniciado com sucesso!")
-    
-    yield
-    
-    # Para agendadores
-    logger.info("Parando agendadores...")
-    stop_ml_scheduler()
-    stop_forecast_scheduler()
-    logger.info("Aplicacao finalizada")
 
-app = FastAPI(
-    title="FitCore AI Service",
-    description="Servico de analise de sentimentos e previsoes financeiras",
-    version="1.0.0",
-    lifespan=lifespan
-) # uvicorn main:app --reload
+def create_app() -> FastAPI:
+    """
+    Cria a aplicação FastAPI de acordo com as variáveis de ambiente:
+    SEED_ON_STARTUP, RUN_VALIDATE_ON_STARTUP e ENABLE_FORECAST
+    """
+    seed_on_startup = env_flag("SEED_ON_STARTUP", "true")
+    run_validate_on_startup = env_flag("RUN_VALIDATE_ON_STARTUP")
+    enable_forecast = env_flag("ENABLE_FORECAST", "true")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        logger.info("Iniciando FitCore AI Service...")
+        
+        # Log do scheduler ML (arquivo + console em thread própria), antes de qualquer uso
+        setup_scheduler_logging()
+        
+        # 1. Criar tabelas do banco de dados
+        create_db_and_tables()
+        logger.info("Banco de dados inicializado")
+        
+        # 2. Popular com dados de teste (seed_data), apenas se o banco ainda estiver vazio
+        if seed_on_startup:
+            from database.seed_data import create_test_feedbacks
+            logger.info("Executando seed_data...")
+            create_test_feedbacks()
+            logger.info("Seed de dados de teste concluído")
+        
+        # 3. Executar validação se solicitado via variável de ambiente
+        #    Roda em uma thread do executor para não atrasar o startup
+        #    (também disponível sob demanda em POST /feedbacks/test/validate-system)
+        if run_validate_on_startup:
+            from tests.run_tests import validate_sentiment_analysis
+            logger.info("Executando validacao de sentimentos em segundo plano...")
+            validation = asyncio.get_running_loop().run_in_executor(None, validate_sentiment_analysis)
+            validation.add_done_callback(log_validation_result)
+        
+        # 4. Iniciar agendadores (o ML scheduler vai processar os feedbacks criados)
+        #    O agendador de previsões (Prophet) só é importado quando habilitado
+        logger.info("Iniciando agendadores...")
+        start_ml_scheduler()
+        if enable_forecast:
+            from services.forecast_scheduler import start_forecast_scheduler
+            start_forecast_scheduler()
+        logger.info("Agendadores ativos")
+        
+        logger.info("FitCore AI Service iniciado com sucesso!")
+        
+        yield
+        
+        # Para agendadores
+        logger.info("Parando agendadores...")
+        stop_ml_scheduler()
+        if enable_forecast:
+            from services.forecast_scheduler import stop_forecast_scheduler
+            stop_forecast_scheduler()
+        logger.info("Aplicacao finalizada")
+        
+        # Escreve os registros pendentes do scheduler e encerra a thread de log
+        shutdown_scheduler_logging()
+
+    app = FastAPI(
+        title="FitCore AI Service",
+        description="Servico de analise de sentimentos e previsoes financeiras",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    @app.get("/")
+    async def root():
+        return {
+            "message": "FitCore AI Service esta funcionando!",
+            "version": "1.0.0",
+            "features": [
+                "Dados de teste carregados automaticamente",
+                "Analise de sentimentos com ML",
+                "Previsoes financeiras automaticas",
+                "Agendadores ativos"
+            ],
+            "status": "Todos os servicos operacionais"
+        }
 
-@app.get("/")
-async def root():
-    return {
-        "message": "FitCore AI Service esta funcionando!",
-        "version": "1.0.0",
-        "features": [
-            "Dados de teste carregados automaticamente",
-            "Analise de sentimentos com ML",
-            "Previsoes financeiras automaticas",
-            "Agendadores ativos"
-        ],
-        "status": "Todos os servicos operacionais"
-    }
+    app.include_router(feedbacks_router)
+    return app
 
-app.include_router(feedbacks_router)
\ No newline at end of file
+app = create_app() # uvicorn main:app --reload
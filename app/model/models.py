@@ -1,13 +1,17 @@
 import uuid
 import enum
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from typing import Optional
 from decimal import Decimal
 
-from sqlalchemy import func, Column, DECIMAL
+from sqlalchemy import func, Column, DECIMAL, Index
 
 from sqlmodel import Field, SQLModel
 
+def utc_now() -> datetime:
+    """Instante atual em UTC, sem tzinfo (as colunas de data são timestamp sem fuso)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class SentimentEnum(str, enum.Enum):
     positive = "positive"
     negative = "negative"
@@ -35,11 +39,14 @@ class Feedback(FeedbackBase, table=True):
     score_compound: float | None = Field(default=0.0)
 
     created_at: Optional[datetime] = Field(
-        default=None,
+        default_factory=utc_now,
         sa_column_kwargs={"server_default": func.now()}
     )
 
 class Word_Frequency(SQLModel, table=True):
+    # Leitura ordenada das palavras mais frequentes de cada sentimento
+    __table_args__ = (Index("ix_wf_sentiment_freq", "sentiment", "frequency"),)
+
     id: uuid.UUID = Field(
         default_factory=uuid.uuid4, 
         primary_key=True
@@ -56,10 +63,19 @@ class Word_Frequency(SQLModel, table=True):
     )
 
     created_at: Optional[datetime] = Field(
-        default=None,
+        default_factory=utc_now,
         sa_column_kwargs={"server_default": func.now()}
     )
 
+class Word_Count(SQLModel, table=True):
+    # Contagem acumulada de cada palavra (normalizada e com stemming) por sentimento,
+    # incrementada a cada lote classificado; o top de Word_Frequency sai daqui
+    sentiment: SentimentEnum = Field(primary_key=True)
+    word: str = Field(primary_key=True)
+    frequency: int = Field(
+        default=0
+    )
+
 # Modelos para os dados financeiros do analytics_db
 class Profit(SQLModel, table=True):
     id: str = Field(primary_key=True)
@@ -70,9 +86,6 @@ class Profit(SQLModel, table=True):
     net_profit: float = Field()
     profit_margin: float = Field()
     created_at: datetime = Field()
-    
-    class Config:
-        table = True
 
 class ProfitForecast(SQLModel, table=True):
     id: uuid.UUID = Field(
@@ -85,11 +98,23 @@ class ProfitForecast(SQLModel, table=True):
     upper_bound: float = Field()  # yhat_upper
     model_version: str = Field(default="v1.0")  # Para rastreabilidade
     created_at: datetime = Field(
-        default_factory=datetime.now,
+        default_factory=utc_now,
         sa_column_kwargs={"server_default": func.now()}
     )
 
 # DTOs para resposta da API
+class FeedbackBulkResponse(SQLModel):
+    inserted: int
+
+class WordFrequencyItem(SQLModel):
+    word: str
+    frequency: int
+
+class WordFrequencyResponse(SQLModel):
+    positive: list[WordFrequencyItem]
+    negative: list[WordFrequencyItem]
+    neutral: list[WordFrequencyItem]
+
 class ForecastResponse(SQLModel):
     forecast_date: date
     predicted_net_profit: float
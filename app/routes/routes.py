@@ -1,27 +1,51 @@
-from typing import Sequence
-from fastapi import APIRouter
+from typing import Annotated, Sequence
+from fastapi import APIRouter, Body, Header, Query, Response
 from database.db_connect import SessionDep
-from model.models import Feedback, FeedbackCreate
+from model.models import Feedback, FeedbackCreate, FeedbackBulkResponse, WordFrequencyResponse
 from services.analyzer import (
     create_feedback_service,
+    create_feedbacks_bulk_service,
     get_all_feedbacks_service,
-    get_most_common_words_by_sentiment_service
+    get_most_common_words_by_sentiment_service,
+    get_word_frequency_version
 )
 from tests.run_tests import validate_sentiment_analysis
 
 router = APIRouter(prefix="/feedbacks", tags=["feedbacks"])
 
-@router.post("/")
+@router.post("/", response_model=Feedback)
 def create_feedback(feedback: FeedbackCreate, session: SessionDep) -> Feedback:
     return create_feedback_service(feedback, session)
 
-@router.get("/")
-def get_all_feedbacks(session: SessionDep) -> Sequence[Feedback]:
-    return get_all_feedbacks_service(session)
+@router.post("/bulk", response_model=FeedbackBulkResponse)
+def create_feedbacks_bulk(
+    feedbacks: Annotated[list[FeedbackCreate], Body(max_length=1000)],
+    session: SessionDep
+) -> dict:
+    return create_feedbacks_bulk_service(feedbacks, session)
 
-@router.get("/word-frequency")
-def most_common_words_by_sentiment(session: SessionDep):
-    return get_most_common_words_by_sentiment_service(session)
+@router.get("/", response_model=list[Feedback])
+def get_all_feedbacks(
+    session: SessionDep,
+    limit: int = Query(default=100, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0)
+) -> Sequence[Feedback]:
+    return get_all_feedbacks_service(session, limit=limit, offset=offset)
+
+@router.get("/word-frequency", response_model=WordFrequencyResponse)
+def most_common_words_by_sentiment(
+    session: SessionDep,
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None
+):
+    # ETag derivado do conteúdo da resposta: requisições condicionais recebem 304 sem corpo
+    word_frequencies = get_most_common_words_by_sentiment_service(session)
+    version = get_word_frequency_version(word_frequencies)
+    cache_headers = {"ETag": f'"{version}"', "Cache-Control": "public, max-age=60"}
+    if if_none_match == cache_headers["ETag"]:
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    return word_frequencies
 
 @router.post("/test/validate-system")
 def validate_system(session: SessionDep):
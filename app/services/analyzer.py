@@ -1,5 +1,7 @@
+import hashlib
+import json
 from sqlmodel import Session, select
-from sqlalchemy import desc
+from sqlalchemy import desc, func, insert
 from model.models import Feedback, FeedbackCreate, Word_Frequency
 from database.db_connect import SessionDep
 from typing import Sequence
@@ -7,17 +9,54 @@ from typing import Sequence
 def create_feedback_service(feedback_data: FeedbackCreate, session: SessionDep) -> Feedback:
     feedback_obj = Feedback(text=feedback_data.text) # sentiment fica no_analyzed
     session.add(feedback_obj)
-    session.commit()
-    session.refresh(feedback_obj)
+    session.commit()  # id e created_at já são gerados no cliente, sem SELECT de refresh
     return feedback_obj
 
-def get_all_feedbacks_service(session: Session) -> Sequence[Feedback]:
-    return session.exec(select(Feedback)).all()
+def create_feedbacks_bulk_service(feedbacks_data: Sequence[FeedbackCreate], session: Session) -> dict:
+    # Um único INSERT com múltiplas linhas e um único commit para o lote inteiro
+    if feedbacks_data:
+        session.execute(insert(Feedback), [{"text": feedback.text} for feedback in feedbacks_data])
+        session.commit()
+    return {"inserted": len(feedbacks_data)}
+
+def get_all_feedbacks_service(session: Session, limit: int = 100, offset: int = 0) -> Sequence[Feedback]:
+    # Paginado: mais recentes primeiro, id como desempate para uma ordem estável
+    statement = (
+        select(Feedback)
+        .order_by(desc(Feedback.created_at), Feedback.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return session.exec(statement).all()
+
+WORDS_PER_SENTIMENT = 50
+
+def get_word_frequency_version(word_frequencies: dict) -> str:
+    """
+    Identifica o conteúdo de uma resposta de palavras mais frequentes: derivada das
+    próprias palavras e frequências, muda sempre que qualquer uma delas muda
+    """
+    payload = json.dumps(word_frequencies, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(payload.encode()).hexdigest()
 
 def get_most_common_words_by_sentiment_service(session: Session) -> dict:
     """Retorna as palavras mais frequentes já calculadas pelo scheduler"""
+    # Ranking por sentimento no próprio banco (usa o índice ix_wf_sentiment_freq);
+    # a palavra desempata frequências iguais, para uma resposta (e um ETag) estável
+    rank = func.row_number().over(
+        partition_by=Word_Frequency.sentiment,
+        order_by=(desc(Word_Frequency.frequency), Word_Frequency.word)
+    ).label("rank")
+    ranked = select(
+        Word_Frequency.word,
+        Word_Frequency.sentiment,
+        Word_Frequency.frequency,
+        rank
+    ).subquery()
     word_frequencies = session.exec(
-        select(Word_Frequency).order_by(desc(Word_Frequency.sentiment))
+        select(ranked.c.word, ranked.c.sentiment, ranked.c.frequency)
+        .where(ranked.c.rank <= WORDS_PER_SENTIMENT)
+        .order_by(ranked.c.sentiment, ranked.c.rank)
     ).all()
 
     result = {
@@ -26,11 +65,11 @@ def get_most_common_words_by_sentiment_service(session: Session) -> dict:
         "neutral": []
     }
 
-    for wf in word_frequencies:
-        if wf.sentiment.value in result:
-            result[wf.sentiment.value].append({
-                "word": wf.word,
-                "frequency": wf.frequency
+    for word, sentiment, frequency in word_frequencies:
+        if sentiment.value in result:
+            result[sentiment.value].append({
+                "word": word,
+                "frequency": frequency
             })
     
     return result
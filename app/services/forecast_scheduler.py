@@ -10,8 +10,6 @@ from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from services.prophet_forecaster import ProfitForecaster
-
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,7 +21,17 @@ class ForecastScheduler:
     
     def __init__(self):
         self.scheduler = BackgroundScheduler()
-        self.forecaster = ProfitForecaster()
+        self._forecaster = None
+    
+    @property
+    def forecaster(self):
+        """
+        Instancia o ProfitForecaster no primeiro uso (importa Prophet/pandas apenas quando necessário)
+        """
+        if self._forecaster is None:
+            from services.prophet_forecaster import ProfitForecaster
+            self._forecaster = ProfitForecaster()
+        return self._forecaster
         
     def setup_scheduled_tasks(self):
         """
@@ -66,7 +74,7 @@ class ForecastScheduler:
             logger.info("Tarefas agendadas configuradas com sucesso")
             
         except Exception as e:
-            logger.error(f"Erro ao configurar tarefas agendadas: {e}")
+            logger.error("Erro ao configurar tarefas agendadas: %s", e)
             raise
     
     def _monthly_forecast_job(self):
@@ -79,12 +87,13 @@ class ForecastScheduler:
             # Gera previsões para 6 meses
             summary = self.forecaster.generate_and_save_forecasts(periods=6)
             
-            logger.info(f"Previsões mensais geradas: {summary.total_forecasts} registros")
-            logger.info(f"Lucro médio previsto: ${summary.avg_predicted_profit:,.2f}")
-            logger.info(f"Período: {summary.forecast_period_start} até {summary.forecast_period_end}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Previsões mensais geradas: %s registros", summary.total_forecasts)
+                logger.info("Lucro médio previsto: $%s", format(summary.avg_predicted_profit, ",.2f"))
+                logger.info("Período: %s até %s", summary.forecast_period_start, summary.forecast_period_end)
             
         except Exception as e:
-            logger.error(f"Erro na geração mensal de previsões: {e}")
+            logger.error("Erro na geração mensal de previsões: %s", e)
     
     def _weekly_forecast_update(self):
         """
@@ -94,29 +103,28 @@ class ForecastScheduler:
             logger.info("Verificando necessidade de atualização semanal...")
             
             # Verifica se há previsões atuais
-            current_forecasts = self.forecaster.get_current_forecasts()
+            latest_forecast_date, _ = self.forecaster.get_forecast_stats()
             
-            if not current_forecasts:
+            if latest_forecast_date is None:
                 logger.info("[PREVISAO] Nenhuma previsão atual encontrada. Gerando novas...")
                 self._monthly_forecast_job()
                 return
             
             # Verifica se as previsões são muito antigas (mais de 7 dias)
-            latest_forecast = max(current_forecasts, key=lambda x: x.forecast_date)
-            days_old = (datetime.now().date() - latest_forecast.forecast_date).days
+            days_old = (datetime.now().date() - latest_forecast_date).days
             
             # Verifica se a última previsão é para uma data no passado
-            if latest_forecast.forecast_date <= datetime.now().date():
+            if latest_forecast_date <= datetime.now().date():
                 logger.info("Previsões desatualizadas (data no passado). Atualizando...")
                 self._monthly_forecast_job()
             elif days_old > 7:
-                logger.info(f"Previsões antigas detectadas ({days_old} dias). Atualizando...")
+                logger.info("Previsões antigas detectadas (%s dias). Atualizando...", days_old)
                 self._monthly_forecast_job()
             else:
-                logger.info(f"Previsões atuais ainda válidas ({days_old} dias)")
+                logger.info("Previsões atuais ainda válidas (%s dias)", days_old)
             
         except Exception as e:
-            logger.error(f"Erro na atualização semanal: {e}")
+            logger.error("Erro na atualização semanal: %s", e)
     
     def _cleanup_old_logs(self):
         """
@@ -128,7 +136,7 @@ class ForecastScheduler:
             logger.info("Limpeza de logs concluída")
             
         except Exception as e:
-            logger.error(f"Erro na limpeza de logs: {e}")
+            logger.error("Erro na limpeza de logs: %s", e)
     
     def _initial_forecast_generation(self):
         """
@@ -138,49 +146,50 @@ class ForecastScheduler:
             logger.info("Iniciando geração de previsões ao startup da aplicação...")
             
             # Verifica se há dados históricos suficientes
+            from sqlalchemy import func
             from sqlmodel import Session, select
             from database.db_connect import engine
             from model.models import Profit
             
             with Session(engine) as session:
-                profit_count = len(session.exec(select(Profit)).all())
+                profit_count = session.exec(select(func.count()).select_from(Profit)).one()
                 
                 if profit_count < 3:
-                    logger.warning(f"Dados históricos insuficientes ({profit_count} registros). Mínimo: 3, Recomendado: 6+")
+                    logger.warning("Dados históricos insuficientes (%s registros). Mínimo: 3, Recomendado: 6+", profit_count)
                     logger.info("Execute o script populate_sample_data.py para gerar dados de exemplo")
                     return
                 elif profit_count < 6:
-                    logger.warning(f"Dados limitados ({profit_count} registros). Previsões básicas serão geradas. Recomendado: 6+ meses para melhor qualidade.")
+                    logger.warning("Dados limitados (%s registros). Previsões básicas serão geradas. Recomendado: 6+ meses para melhor qualidade.", profit_count)
                 
-                # Log detalhado dos dados históricos para diagnóstico
-                profits = session.exec(select(Profit).order_by("period_start")).all()
-                logger.info(f"[DADOS] DADOS HISTÓRICOS DISPONÍVEIS ({len(profits)} registros):")
-                for profit in profits:
-                    logger.info(f"   {profit.period_start.strftime('%Y-%m')}: ${profit.net_profit:,.2f}")
+                # Log detalhado dos dados históricos para diagnóstico (só consulta se for emitido)
+                if logger.isEnabledFor(logging.INFO):
+                    profits = session.exec(
+                        select(Profit.period_start, Profit.net_profit).order_by(Profit.period_start)
+                    ).all()
+                    logger.info("[DADOS] DADOS HISTÓRICOS DISPONÍVEIS (%s registros):", len(profits))
+                    for period_start, net_profit in profits:
+                        logger.info("   %s: $%s", period_start.strftime('%Y-%m'), format(net_profit, ",.2f"))
             
-            # Verifica se já existem previsões válidas
-            current_forecasts = self.forecaster.get_current_forecasts()
+            # Verifica se já existem previsões válidas (quantas são para datas futuras)
+            _, future_forecasts = self.forecaster.get_forecast_stats()
             
             # Se não há previsões ou elas estão desatualizadas, gera novas
             should_generate = True
             
-            if current_forecasts:
-                # Verifica se as previsões são atuais (pelo menos uma previsão futura)
-                future_forecasts = [f for f in current_forecasts if f.forecast_date > datetime.now().date()]
-                
-                if len(future_forecasts) >= 3:  # Pelo menos 3 meses de previsões futuras
-                    logger.info(f"Previsões válidas encontradas ({len(future_forecasts)} meses futuros). Pulando geração inicial.")
-                    should_generate = False
+            if future_forecasts >= 3:  # Pelo menos 3 meses de previsões futuras
+                logger.info("Previsões válidas encontradas (%s meses futuros). Pulando geração inicial.", future_forecasts)
+                should_generate = False
             
             if should_generate:
                 logger.info("[GERANDO] GERANDO NOVAS PREVISÕES...")
                 # Gera previsões para 6 meses
                 summary = self.forecaster.generate_and_save_forecasts(periods=6)
                 
-                logger.info(f"[SUCESSO] Previsões iniciais geradas com sucesso!")
-                logger.info(f"   Total de previsões: {summary.total_forecasts}")
-                logger.info(f"   Lucro médio previsto: ${summary.avg_predicted_profit:,.2f}")
-                logger.info(f"   Período: {summary.forecast_period_start} até {summary.forecast_period_end}")
+                logger.info("[SUCESSO] Previsões iniciais geradas com sucesso!")
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("   Total de previsões: %s", summary.total_forecasts)
+                    logger.info("   Lucro médio previsto: $%s", format(summary.avg_predicted_profit, ",.2f"))
+                    logger.info("   Período: %s até %s", summary.forecast_period_start, summary.forecast_period_end)
                 
                 # Alertas baseados nos resultados
                 if summary.avg_predicted_profit < 0:
@@ -196,7 +205,7 @@ class ForecastScheduler:
                 logger.info("🤖 Modelo Prophet treinado com sucesso")
             
         except Exception as e:
-            logger.error(f"Erro na geração inicial de previsões: {e}")
+            logger.error("Erro na geração inicial de previsões: %s", e)
             # Não propaga o erro para não impedir o startup da aplicação
     
     def start_scheduler(self):
@@ -214,19 +223,19 @@ class ForecastScheduler:
                 try:
                     self._initial_forecast_generation()
                 except Exception as e:
-                    logger.error(f"Erro na geração inicial de previsões: {e}")
+                    logger.error("Erro na geração inicial de previsões: %s", e)
                 
                 # Log das próximas execuções
-                jobs = self.scheduler.get_jobs()
-                for job in jobs:
-                    next_run = job.next_run_time
-                    if next_run:
-                        logger.info(f"Próxima execução de '{job.name}': {next_run}")
+                if logger.isEnabledFor(logging.INFO):
+                    for job in self.scheduler.get_jobs():
+                        next_run = job.next_run_time
+                        if next_run:
+                            logger.info("Próxima execução de '%s': %s", job.name, next_run)
             else:
                 logger.warning("Agendador já está em execução")
                 
         except Exception as e:
-            logger.error(f"Erro ao iniciar agendador: {e}")
+            logger.error("Erro ao iniciar agendador: %s", e)
             raise
     
     def stop_scheduler(self):
@@ -241,7 +250,7 @@ class ForecastScheduler:
                 logger.warning("Agendador já estava parado")
                 
         except Exception as e:
-            logger.error(f"Erro ao parar agendador: {e}")
+            logger.error("Erro ao parar agendador: %s", e)
     
 # Instância global do agendador
 forecast_scheduler = ForecastScheduler()
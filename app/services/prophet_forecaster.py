@@ -6,21 +6,45 @@ Mantém apenas 6 meses de previsões futuras no banco de dados.
 Usado apenas pelo scheduler automático.
 """
 
+import glob
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from typing import List
+from datetime import date
+from typing import Dict, List, Optional, Tuple
 import logging
 
 from prophet import Prophet
-from sqlmodel import Session, select
+from prophet.serialize import model_from_json, model_to_json
+from sqlalchemy import func
+from sqlmodel import Session, delete, select
 
-from model.models import Profit, ProfitForecast, ForecastResponse, ForecastSummary
+from model.models import Profit, ProfitForecast, ForecastResponse, ForecastSummary, utc_now
 from database.db_connect import engine
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Modelos Prophet já treinados ficam em cache em disco, identificados pelos dados de treino
+MODEL_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../ai_model"))
+
+# Assinatura dos dados da última previsão salva, gravada ao lado do cache do modelo:
+# sobrevive a reinícios e é compartilhada pelos workers que usam o mesmo diretório
+RUN_SIGNATURE_PATH = os.path.join(MODEL_CACHE_DIR, "forecast_signature.json")
+
+# Incrementar sempre que a configuração do Prophet em _train_model mudar (invalida o cache)
+TRAINING_CONFIG_VERSION = 2
+
+# Rótulos dos meses com a sazonalidade fitness esperada
+MONTH_LABELS = {
+    1: 'Jan [PICO]', 2: 'Fev [ALTA]', 3: 'Mar [NORMAL]', 4: 'Abr [NORMAL]', 
+    5: 'Mai [NORMAL]', 6: 'Jun [BAIXA]', 7: 'Jul [ALTA]', 8: 'Ago [NORMAL]',
+    9: 'Set [ALTA]', 10: 'Out [PICO]', 11: 'Nov [ALTA]', 12: 'Dez [BAIXA]'
+}
+
 class ProfitForecaster:
     """
     Classe responsável por gerar previsões de lucro usando Prophet
@@ -30,6 +54,50 @@ class ProfitForecaster:
     def __init__(self, model_version: str = "v2.0"):
         self.model_version = model_version
         self.prophet_model = None
+        self.prophet_model_key = None
+        self.last_run_signature = None
+    
+    def _model_cache_key(self, df: pd.DataFrame) -> str:
+        """
+        Identifica o modelo pelos dados de treino, versão do modelo e da configuração
+        """
+        digest = hashlib.sha1()
+        digest.update(f"{self.model_version}|{TRAINING_CONFIG_VERSION}".encode())
+        digest.update(df['ds'].to_numpy(dtype='datetime64[ns]').tobytes())
+        digest.update(df['y'].to_numpy(dtype='float64').tobytes())
+        return digest.hexdigest()
+    
+    def _load_cached_model(self, cache_key: str) -> Optional[Prophet]:
+        """
+        Reaproveita o modelo treinado com os mesmos dados (memória ou disco)
+        """
+        if self.prophet_model is not None and self.prophet_model_key == cache_key:
+            return self.prophet_model
+        
+        cache_path = os.path.join(MODEL_CACHE_DIR, f"prophet_{cache_key}.json")
+        if not os.path.exists(cache_path):
+            return None
+        
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return model_from_json(f.read())
+        except Exception as e:
+            logger.warning("Cache do modelo Prophet inválido, retreinando: %s", e)
+            return None
+    
+    def _save_cached_model(self, model: Prophet, cache_key: str):
+        """
+        Salva o modelo treinado em disco e remove os modelos de dados anteriores
+        """
+        cache_path = os.path.join(MODEL_CACHE_DIR, f"prophet_{cache_key}.json")
+        try:
+            for old_path in glob.glob(os.path.join(MODEL_CACHE_DIR, "prophet_*.json")):
+                if old_path != cache_path:
+                    os.remove(old_path)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                f.write(model_to_json(model))
+        except Exception as e:
+            logger.warning("Não foi possível salvar o cache do modelo Prophet: %s", e)
         
     def _fetch_historical_data(self, session: Session) -> pd.DataFrame:
         """
@@ -39,32 +107,52 @@ class ProfitForecaster:
             DataFrame com colunas 'ds' (data) e 'y' (lucro líquido)
         """
         try:
-            # Query para buscar dados ordenados por período
-            query = select(Profit).order_by("period_start")
+            # Query para buscar dados ordenados por período (apenas as duas colunas usadas)
+            query = select(Profit.period_start, Profit.net_profit).order_by(Profit.period_start)
             result = session.exec(query).all()
             
             if not result:
                 raise ValueError("Nenhum dado histórico encontrado na tabela profits")
                 
-            # Converte para DataFrame do Prophet
-            df = pd.DataFrame([
-                {"ds": row.period_start, "y": float(row.net_profit)} 
-                for row in result
-            ])
+            # Converte para DataFrame do Prophet a partir de arrays NumPy já tipados
+            count = len(result)
+            ds = np.fromiter((row.period_start for row in result), dtype='datetime64[D]', count=count)
+            y = np.fromiter((row.net_profit for row in result), dtype=np.float64, count=count)
+            df = pd.DataFrame({'ds': ds.astype('datetime64[ns]'), 'y': y})
             
-            # Converte coluna de data
-            df['ds'] = pd.to_datetime(df['ds'])
-            
-            logger.info(f"Dados históricos carregados: {len(df)} registros")
-            logger.info(f"Período: {df['ds'].min()} até {df['ds'].max()}")
+            logger.info("Dados históricos carregados: %s registros", len(df))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Período: %s até %s", df['ds'].min(), df['ds'].max())
             
             return df
             
         except Exception as e:
-            logger.error(f"Erro ao buscar dados históricos: {e}")
+            logger.error("Erro ao buscar dados históricos: %s", e)
             raise
     
-    def _validate_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _sorted_quantile(sorted_values: np.ndarray, q: float) -> float:
+        """
+        Quantil de um array já ordenado, com a mesma interpolação linear do np.quantile
+        
+        Args:
+            sorted_values: Valores em ordem crescente
+            q: Quantil desejado (0 a 1)
+            
+        Returns:
+            O quantil como escalar
+        """
+        position = (len(sorted_values) - 1) * q
+        lower = int(np.floor(position))
+        upper = min(lower + 1, len(sorted_values) - 1)
+        fraction = position - lower
+        a, b = sorted_values[lower], sorted_values[upper]
+        # Mesma fórmula do np.quantile (interpola a partir do vizinho mais próximo)
+        if fraction >= 0.5:
+            return float(b - (b - a) * (1 - fraction))
+        return float(a + (b - a) * fraction)
+    
+    def _validate_data(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, float]]:
         """
         Valida e limpa os dados para garantir qualidade das previsões
         Inclui tratamento simples de outliers
@@ -73,7 +161,8 @@ class ProfitForecaster:
             df: DataFrame com dados históricos
             
         Returns:
-            DataFrame limpo e validado
+            DataFrame limpo e validado, e o mínimo e o máximo do lucro já limpo
+            ('min', 'max'), reaproveitados nas estatísticas do relatório
         """
         if len(df) < 2:
             raise ValueError(f"Dados insuficientes. Necessário pelo menos 2 pontos, encontrados {len(df)}")
@@ -83,83 +172,102 @@ class ProfitForecaster:
             logger.warning("Valores nulos encontrados nos dados. Removendo...")
             df = df.dropna()
         
+        # Uma única ordenação da série: quartis, valores de suavização e extremos saem dela
+        y = df['y'].to_numpy()
+        sorted_y = np.sort(y)
+        low_index, high_index = 0, len(sorted_y)
+        
         # Tratamento simples de outliers apenas se temos dados suficientes
         if len(df) >= 6:
             # Calcula quartis e IQR
-            q1 = df['y'].quantile(0.25)
-            q3 = df['y'].quantile(0.75)
+            q1 = self._sorted_quantile(sorted_y, 0.25)
+            q3 = self._sorted_quantile(sorted_y, 0.75)
             iqr = q3 - q1
             
             # Limites conservadores para outliers (3x IQR em vez de 1.5x)
             lower_bound = q1 - 3 * iqr
             upper_bound = q3 + 3 * iqr
             
-            # Identifica outliers
-            outliers_mask = (df['y'] < lower_bound) | (df['y'] > upper_bound)
-            outliers_count = outliers_mask.sum()
+            # Na série ordenada os outliers são o início (negativos) e o fim (positivos)
+            low_index = int(np.searchsorted(sorted_y, lower_bound, side='left'))
+            high_index = int(np.searchsorted(sorted_y, upper_bound, side='right'))
+            negative_count = low_index
+            positive_count = len(sorted_y) - high_index
+            outliers_count = negative_count + positive_count
             
             if outliers_count > 0:
-                logger.warning(f"[OUTLIERS] Detectados {outliers_count} outliers extremos")
-                
-                # Suaviza outliers em vez de removê-los (mantém sazonalidade)
-                df_clean = df.copy()
+                logger.warning("[OUTLIERS] Detectados %s outliers extremos", outliers_count)
                 
-                # Para outliers negativos, substitui pela mediana dos valores baixos
-                negative_outliers = df['y'] < lower_bound
-                if negative_outliers.any():
-                    median_low = df[df['y'] >= lower_bound]['y'].quantile(0.25)
-                    df_clean.loc[negative_outliers, 'y'] = median_low
-                    logger.info(f"   {negative_outliers.sum()} outliers negativos suavizados para ${median_low:,.2f}")
+                # Suaviza outliers em vez de removê-los (mantém sazonalidade):
+                # negativos pela mediana dos valores baixos, positivos pela dos valores altos
+                # (quartis dos valores sem os outliers, fatias contíguas da série ordenada)
+                median_low = self._sorted_quantile(sorted_y[low_index:], 0.25) if negative_count else np.nan
+                median_high = self._sorted_quantile(sorted_y[:high_index], 0.75) if positive_count else np.nan
                 
-                # Para outliers positivos, substitui pela mediana dos valores altos
-                positive_outliers = df['y'] > upper_bound
-                if positive_outliers.any():
-                    median_high = df[df['y'] <= upper_bound]['y'].quantile(0.75)
-                    df_clean.loc[positive_outliers, 'y'] = median_high
-                    logger.info(f"   {positive_outliers.sum()} outliers positivos suavizados para ${median_high:,.2f}")
+                # O DataFrame é criado por _fetch_historical_data só para este fluxo:
+                # substitui a coluna diretamente, sem copiar o frame inteiro
+                df['y'] = np.where(y < lower_bound, median_low, np.where(y > upper_bound, median_high, y))
                 
-                return df_clean
+                if logger.isEnabledFor(logging.INFO):
+                    if negative_count:
+                        logger.info("   %s outliers negativos suavizados para $%s", negative_count, format(median_low, ',.2f'))
+                    if positive_count:
+                        logger.info("   %s outliers positivos suavizados para $%s", positive_count, format(median_high, ',.2f'))
             else:
                 logger.info("[OK] Nenhum outlier extremo detectado")
         
-        return df
+        # Os valores suavizados ficam dentro da faixa não-outlier, então os extremos da
+        # série limpa são o primeiro e o último valor não-outlier da série ordenada
+        extremes = {'min': float(sorted_y[low_index]), 'max': float(sorted_y[high_index - 1])}
+        return df, extremes
     
-    def _train_model(self, df: pd.DataFrame) -> Prophet:
+    def _train_model(self, df: pd.DataFrame, force_retrain: bool = False) -> Prophet:
         """
         Treina o modelo Prophet com os dados históricos
         Inclui sazonalidade específica para negócio fitness
         
         Args:
             df: DataFrame com dados históricos formatados para Prophet
+            force_retrain: Se True, ignora o modelo em cache e treina novamente
             
         Returns:
             Modelo Prophet treinado
         """
         try:
+            cache_key = self._model_cache_key(df)
+            if not force_retrain:
+                cached_model = self._load_cached_model(cache_key)
+                if cached_model is not None:
+                    logger.info("[CACHE] Dados históricos inalterados - reutilizando modelo Prophet já treinado")
+                    self.prophet_model_key = cache_key
+                    return cached_model
+            
             data_points = len(df)
-            logger.info(f"[TREINAMENTO] Treinando modelo fitness com {data_points} pontos de dados")
+            logger.info("[TREINAMENTO] Treinando modelo fitness com %s pontos de dados", data_points)
             
             # Configuração otimizada para negócio fitness
             if data_points <= 6:
-                logger.info(f"[DADOS] Poucos dados ({data_points} pontos) - configuração conservadora")
+                logger.info("[DADOS] Poucos dados (%s pontos) - configuração conservadora", data_points)
                 model = Prophet(
                     changepoint_prior_scale=0.01,    # Menos sensível a mudanças
                     seasonality_prior_scale=0.8,     # Sazonalidade moderada para fitness
                     interval_width=0.95,             # Intervalo de confiança maior
                     n_changepoints=min(2, data_points - 1),  # Máximo 2 pontos de mudança
+                    uncertainty_samples=200,         # Amostras suficientes para os intervalos de 6 meses
                     yearly_seasonality='auto',       # Deixa automático para poucos dados
-                    weekly_seasonality='auto',       # Não aplicável para dados mensais
-                    daily_seasonality='auto'         # Não aplicável para dados mensais
+                    weekly_seasonality=False,        # Não aplicável para dados mensais
+                    daily_seasonality=False          # Não aplicável para dados mensais
                 )
             else:
-                logger.info(f"[DADOS] Dados suficientes ({data_points} pontos) - configuração fitness otimizada")
+                logger.info("[DADOS] Dados suficientes (%s pontos) - configuração fitness otimizada", data_points)
                 model = Prophet(
                     changepoint_prior_scale=0.05,    # Moderadamente sensível a mudanças
                     seasonality_prior_scale=1.0,     # Sazonalidade normal para captar padrões fitness
                     interval_width=0.90,             # Intervalo de confiança padrão
+                    uncertainty_samples=200,         # Amostras suficientes para os intervalos de 6 meses
                     yearly_seasonality='auto',       # Deixa automático, vamos customizar depois
-                    weekly_seasonality='auto',       # Não aplicável
-                    daily_seasonality='auto'         # Não aplicável
+                    weekly_seasonality=False,        # Não aplicável
+                    daily_seasonality=False          # Não aplicável
                 )
             
             # Adiciona sazonalidade anual customizada para fitness (12 meses)
@@ -167,7 +275,7 @@ class ProfitForecaster:
             model.add_seasonality(
                 name='fitness_yearly',
                 period=12,                    # 12 meses no ano
-                fourier_order=4,              # Complexidade moderada (captura até 4 harmônicos)
+                fourier_order=3,              # 3 harmônicos captam os picos de Janeiro e Outubro sem sobreajustar 12-24 pontos
                 prior_scale=1.2               # Um pouco mais forte que o padrão
             )
             
@@ -193,10 +301,13 @@ class ProfitForecaster:
             if data_points >= 12:
                 logger.info("   [SEMESTRAL] Sazonalidade semestral: Ativa (captura picos fitness)")
             
+            self._save_cached_model(model, cache_key)
+            self.prophet_model_key = cache_key
+            
             return model
             
         except Exception as e:
-            logger.error(f"Erro no treinamento do modelo: {e}")
+            logger.error("Erro no treinamento do modelo: %s", e)
             raise
     
     def _generate_forecast(self, model: Prophet, periods: int = 6) -> pd.DataFrame:
@@ -211,21 +322,18 @@ class ProfitForecaster:
             DataFrame com previsões
         """
         try:
-            # Gera dataframe para períodos futuros
-            future = model.make_future_dataframe(periods=periods, freq='MS')  # MS = Month Start
+            # Gera dataframe apenas com os períodos futuros (sem repetir o histórico na predição)
+            future = model.make_future_dataframe(periods=periods, freq='MS', include_history=False)  # MS = Month Start
             
             # Faz a previsão
-            forecast = model.predict(future)
+            forecast_future = model.predict(future)
             
-            # Filtra apenas os períodos futuros
-            forecast_future = forecast.tail(periods).copy()
-            
-            logger.info(f"Previsões geradas para {periods} meses")
+            logger.info("Previsões geradas para %s meses", periods)
             
             return forecast_future[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
             
         except Exception as e:
-            logger.error(f"Erro na geração de previsões: {e}")
+            logger.error("Erro na geração de previsões: %s", e)
             raise
     
     def _clear_old_forecasts(self, session: Session):
@@ -236,16 +344,14 @@ class ProfitForecaster:
             session: Sessão do banco de dados
         """
         try:
-            # Remove todas as previsões existentes
-            forecasts = session.exec(select(ProfitForecast)).all()
-            for forecast in forecasts:
-                session.delete(forecast)
+            # Remove todas as previsões existentes com um único DELETE
+            removed_count = session.exec(delete(ProfitForecast)).rowcount
             session.commit()
             
-            logger.info(f"Removidas {len(forecasts)} previsões antigas")
+            logger.info("Removidas %s previsões antigas", removed_count)
             
         except Exception as e:
-            logger.error(f"Erro ao limpar previsões antigas: {e}")
+            logger.error("Erro ao limpar previsões antigas: %s", e)
             session.rollback()
             raise
     
@@ -258,115 +364,231 @@ class ProfitForecaster:
             forecasts_df: DataFrame com previsões
         """
         try:
-            forecast_objects = []
-            
-            for _, row in forecasts_df.iterrows():
-                forecast = ProfitForecast(
-                    forecast_date=row['ds'].date(),
-                    predicted_net_profit=float(row['yhat']),
-                    lower_bound=float(row['yhat_lower']),
-                    upper_bound=float(row['yhat_upper']),
-                    model_version=self.model_version
+            # Colunas extraídas de uma vez, sem iterar linha a linha no DataFrame
+            forecast_mappings = [
+                {
+                    "forecast_date": forecast_date,
+                    "predicted_net_profit": predicted,
+                    "lower_bound": lower,
+                    "upper_bound": upper,
+                    "model_version": self.model_version
+                }
+                for forecast_date, predicted, lower, upper in zip(
+                    forecasts_df['ds'].dt.date,
+                    forecasts_df['yhat'].tolist(),
+                    forecasts_df['yhat_lower'].tolist(),
+                    forecasts_df['yhat_upper'].tolist()
                 )
-                forecast_objects.append(forecast)
+            ]
             
-            # Adiciona todos os objetos à sessão
-            for forecast in forecast_objects:
-                session.add(forecast)
+            # Um único INSERT em lote, sem passar pelo unit of work do ORM
+            session.bulk_insert_mappings(ProfitForecast, forecast_mappings)
             
             session.commit()
-            logger.info(f"Salvadas {len(forecast_objects)} previsões no banco")
+            logger.info("Salvadas %s previsões no banco", len(forecast_mappings))
             
         except Exception as e:
-            logger.error(f"Erro ao salvar previsões: {e}")
+            logger.error("Erro ao salvar previsões: %s", e)
             session.rollback()
             raise
     
-    def _analyze_forecast_quality(self, historical_df: pd.DataFrame, forecasts_df: pd.DataFrame):
+    @staticmethod
+    def _series_stats(values: pd.Series, extremes: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        Calcula média, desvio padrão, mínimo e máximo de uma série como escalares
+        
+        Args:
+            values: Série numérica (lucro histórico ou previsto)
+            extremes: Mínimo e máximo já conhecidos ('min', 'max'), não recalculados
+            
+        Returns:
+            Dicionário com as estatísticas 'mean', 'std', 'min' e 'max'
+        """
+        array = values.to_numpy(dtype=np.float64)
+        if extremes is None:
+            extremes = {'min': float(array.min()), 'max': float(array.max())}
+        return {
+            'mean': float(array.mean()),
+            'std': float(array.std(ddof=1)) if array.size > 1 else float('nan'),
+            'min': extremes['min'],
+            'max': extremes['max'],
+        }
+    
+    def _analyze_forecast_quality(self, historical_df: pd.DataFrame, forecasts_df: pd.DataFrame,
+                                  historical_stats: Dict[str, float], forecast_stats: Dict[str, float]):
         """
         Analisa qualidade das previsões geradas incluindo padrões sazonais
         
         Args:
             historical_df: DataFrame com dados históricos
             forecasts_df: DataFrame com previsões
+            historical_stats: Estatísticas já calculadas do lucro histórico
+            forecast_stats: Estatísticas já calculadas do lucro previsto
         """
         try:
             # Estatísticas básicas
-            hist_mean = historical_df['y'].mean()
-            hist_std = historical_df['y'].std()
-            pred_mean = forecasts_df['yhat'].mean()
-            pred_std = forecasts_df['yhat'].std()
+            hist_mean = historical_stats['mean']
+            hist_std = historical_stats['std']
+            pred_mean = forecast_stats['mean']
+            pred_std = forecast_stats['std']
             
             # Análise de sazonalidade fitness
-            hist_min = historical_df['y'].min()
-            hist_max = historical_df['y'].max()
-            pred_min = forecasts_df['yhat'].min()
-            pred_max = forecasts_df['yhat'].max()
+            hist_min = historical_stats['min']
+            hist_max = historical_stats['max']
+            pred_min = forecast_stats['min']
+            pred_max = forecast_stats['max']
+            
+            # O relatório em INFO só é formatado quando esse nível está habilitado
+            report_enabled = logger.isEnabledFor(logging.INFO)
             
-            logger.info("[ANALISE] Análise completa das previsões fitness:")
-            logger.info(f"   [HISTORICO] Histórico - Média: ${hist_mean:,.2f} (±${hist_std:,.2f})")
-            logger.info(f"   [PREVISAO] Previsões - Média: ${pred_mean:,.2f} (±${pred_std:,.2f})")
-            logger.info(f"   [VARIACAO_HIST] Variação histórica: ${hist_min:,.2f} a ${hist_max:,.2f}")
-            logger.info(f"   [VARIACAO_PREV] Variação prevista: ${pred_min:,.2f} a ${pred_max:,.2f}")
+            if report_enabled:
+                logger.info("[ANALISE] Análise completa das previsões fitness:")
+                logger.info("   [HISTORICO] Histórico - Média: $%s (±$%s)", format(hist_mean, ',.2f'), format(hist_std, ',.2f'))
+                logger.info("   [PREVISAO] Previsões - Média: $%s (±$%s)", format(pred_mean, ',.2f'), format(pred_std, ',.2f'))
+                logger.info("   [VARIACAO_HIST] Variação histórica: $%s a $%s", format(hist_min, ',.2f'), format(hist_max, ',.2f'))
+                logger.info("   [VARIACAO_PREV] Variação prevista: $%s a $%s", format(pred_min, ',.2f'), format(pred_max, ',.2f'))
             
             # Calcula diferença percentual
             change_percent = ((pred_mean - hist_mean) / hist_mean) * 100 if hist_mean != 0 else 0
             if abs(change_percent) > 50:
-                logger.warning(f"[ALERTA] Grande mudança prevista: {change_percent:+.1f}%")
+                logger.warning("[ALERTA] Grande mudança prevista: %+.1f%%", change_percent)
             else:
-                logger.info(f"   [TENDENCIA] Tendência: {change_percent:+.1f}% em relação ao histórico")
+                logger.info("   [TENDENCIA] Tendência: %+.1f%% em relação ao histórico", change_percent)
             
             # Análise específica dos meses previstos (sazonalidade fitness)
-            forecast_months = []
-            for _, row in forecasts_df.iterrows():
-                month = row['ds'].month
-                month_names = {
-                    1: 'Jan [PICO]', 2: 'Fev [ALTA]', 3: 'Mar [NORMAL]', 4: 'Abr [NORMAL]', 
-                    5: 'Mai [NORMAL]', 6: 'Jun [BAIXA]', 7: 'Jul [ALTA]', 8: 'Ago [NORMAL]',
-                    9: 'Set [ALTA]', 10: 'Out [PICO]', 11: 'Nov [ALTA]', 12: 'Dez [BAIXA]'
-                }
-                month_name = month_names.get(month, f'M{month}')
-                profit = row['yhat']
-                forecast_months.append(f"{month_name}: ${profit:,.0f}")
-            
-            logger.info("   [MENSAL] Previsões por mês (com sazonalidade fitness):")
-            for forecast_month in forecast_months:
-                logger.info(f"      {forecast_month}")
+            if report_enabled:
+                month_names = forecasts_df['ds'].dt.month.map(MONTH_LABELS)
+                profits = forecasts_df['yhat'].map('{:,.0f}'.format)
+                forecast_months = (month_names + ': $' + profits).tolist()
+                
+                logger.info("   [MENSAL] Previsões por mês (com sazonalidade fitness):")
+                for forecast_month in forecast_months:
+                    logger.info("      %s", forecast_month)
             
             # Alerta para qualidade dos dados
             if len(historical_df) < 12:
-                logger.warning(f"⚠️  Dados limitados ({len(historical_df)} pontos). Recomendado: 12+ para sazonalidade completa")
+                logger.warning("⚠️  Dados limitados (%s pontos). Recomendado: 12+ para sazonalidade completa", len(historical_df))
             elif len(historical_df) >= 24:
                 logger.info("✅ Dados suficientes para capturar padrões sazonais robustos")
             else:
                 logger.info("📊 Dados adequados para previsão com sazonalidade básica")
             
         except Exception as e:
-            logger.warning(f"Erro na análise de qualidade: {e}")
+            logger.warning("Erro na análise de qualidade: %s", e)
 
-    def generate_and_save_forecasts(self, periods: int = 6, force_update: bool = False) -> ForecastSummary:
+    def _data_signature(self, session: Session, periods: int) -> List:
+        """
+        Sonda barata de mudança nos dados: uma única consulta agregada sobre Profit
+        
+        Args:
+            session: Sessão do banco de dados
+            periods: Número de meses previstos (faz parte da assinatura)
+            
+        Returns:
+            Lista serializável em JSON: quantidade de registros, último period_start,
+            soma do lucro líquido, períodos e versão do modelo
+        """
+        row_count, latest_period, profit_sum = session.exec(
+            select(func.count(), func.max(Profit.period_start), func.sum(Profit.net_profit))
+        ).one()
+        return [
+            row_count,
+            latest_period.isoformat() if latest_period is not None else None,
+            float(profit_sum) if profit_sum is not None else None,
+            periods,
+            self.model_version,
+        ]
+    
+    def _load_run_signature(self) -> Optional[List]:
+        """
+        Lê a assinatura persistida da última execução (None se não existir ou for inválida)
+        """
+        try:
+            with open(RUN_SIGNATURE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Assinatura da última previsão inválida, ignorando: %s", e)
+            return None
+    
+    def _save_run_signature(self, signature: List):
+        """
+        Persiste a assinatura da execução (arquivo temporário + substituição atômica)
+        """
+        self.last_run_signature = signature
+        try:
+            with open(RUN_SIGNATURE_PATH + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(signature, f)
+            os.replace(RUN_SIGNATURE_PATH + '.tmp', RUN_SIGNATURE_PATH)
+        except Exception as e:
+            logger.warning("Não foi possível salvar a assinatura da previsão: %s", e)
+    
+    def _current_forecasts_summary(self, session: Session) -> Optional[ForecastSummary]:
+        """
+        Monta o resumo das previsões já salvas, sem carregá-las
+        
+        Args:
+            session: Sessão do banco de dados
+            
+        Returns:
+            Resumo das previsões atuais ou None se não houver previsões
+        """
+        total, start_date, end_date, avg_profit, created_at = session.exec(
+            select(
+                func.count(),
+                func.min(ProfitForecast.forecast_date),
+                func.max(ProfitForecast.forecast_date),
+                func.avg(ProfitForecast.predicted_net_profit),
+                func.max(ProfitForecast.created_at)
+            )
+        ).one()
+        if not total:
+            return None
+        
+        return ForecastSummary(
+            total_forecasts=total,
+            forecast_period_start=start_date,
+            forecast_period_end=end_date,
+            avg_predicted_profit=float(avg_profit),
+            model_version=self.model_version,
+            created_at=created_at
+        )
+    
+    def generate_and_save_forecasts(self, periods: int = 6, force_update: bool = False,
+                                    force_retrain: bool = False) -> ForecastSummary:
         """
         Método principal para gerar e salvar previsões
         
         Args:
             periods: Número de meses para prever (padrão: 6)
-            force_update: Se True, força a regeneração mesmo com previsões existentes
+            force_update: Se True, força a regeneração mesmo sem dados novos desde a última execução
+            force_retrain: Se True, treina o Prophet novamente mesmo com dados inalterados
             
         Returns:
             Resumo das previsões geradas
         """
         with Session(engine) as session:
             try:
-                logger.info(f"🔄 Iniciando geração de previsões fitness (modelo {self.model_version})")
+                logger.info("🔄 Iniciando geração de previsões fitness (modelo %s)", self.model_version)
+                
+                # 0. Sem dados novos desde a última execução (deste processo ou persistida
+                #    por uma execução anterior), as previsões salvas continuam válidas
+                signature = self._data_signature(session, periods)
+                if not force_update and signature in (self.last_run_signature, self._load_run_signature()):
+                    summary = self._current_forecasts_summary(session)
+                    if summary is not None:
+                        logger.info("[CACHE] Nenhum dado novo desde a última execução - re-treino ignorado")
+                        return summary
                 
                 # 1. Busca dados históricos
                 df = self._fetch_historical_data(session)
                 
                 # 2. Valida e limpa dados (inclui tratamento de outliers)
-                df = self._validate_data(df)
+                df, historical_extremes = self._validate_data(df)
                 
                 # 3. Treina modelo com sazonalidade fitness
-                model = self._train_model(df)
+                model = self._train_model(df, force_retrain=force_retrain)
                 self.prophet_model = model
                 
                 # 4. Gera previsões
@@ -377,12 +599,16 @@ class ProfitForecaster:
                 
                 # 6. Salva novas previsões
                 self._save_forecasts(session, forecasts_df)
+                self._save_run_signature(signature)
                 
                 # 7. Analisa e reporta qualidade das previsões
-                self._analyze_forecast_quality(df, forecasts_df)
+                #    (estatísticas calculadas uma única vez e reaproveitadas no resumo)
+                historical_stats = self._series_stats(df['y'], historical_extremes)
+                forecast_stats = self._series_stats(forecasts_df['yhat'])
+                self._analyze_forecast_quality(df, forecasts_df, historical_stats, forecast_stats)
                 
                 # 8. Retorna resumo
-                avg_profit = float(forecasts_df['yhat'].mean())
+                avg_profit = forecast_stats['mean']
                 start_date = forecasts_df['ds'].min().date()
                 end_date = forecasts_df['ds'].max().date()
                 
@@ -392,11 +618,11 @@ class ProfitForecaster:
                     forecast_period_end=end_date,
                     avg_predicted_profit=avg_profit,
                     model_version=self.model_version,
-                    created_at=datetime.now()
+                    created_at=utc_now()
                 )
                 
             except Exception as e:
-                logger.error(f"Erro no processo de previsão: {e}")
+                logger.error("Erro no processo de previsão: %s", e)
                 raise
 
     def get_current_forecasts(self) -> List[ForecastResponse]:
@@ -406,22 +632,48 @@ class ProfitForecaster:
         """
         with Session(engine) as session:
             try:
-                results = session.exec(select(ProfitForecast)).all()
-                results = sorted(results, key=lambda x: x.forecast_date)
+                # Ordenação feita pelo banco (índice em forecast_date), apenas as colunas usadas
+                results = session.exec(
+                    select(
+                        ProfitForecast.forecast_date,
+                        ProfitForecast.predicted_net_profit,
+                        ProfitForecast.lower_bound,
+                        ProfitForecast.upper_bound
+                    ).order_by(ProfitForecast.forecast_date)
+                ).all()
                 
-                forecasts = []
-                for forecast in results:
-                    response = ForecastResponse(
-                        forecast_date=forecast.forecast_date,
-                        predicted_net_profit=forecast.predicted_net_profit,
-                        lower_bound=forecast.lower_bound,
-                        upper_bound=forecast.upper_bound,
-                        confidence_interval=forecast.upper_bound - forecast.lower_bound
+                # Dados vindos do banco já são confiáveis: monta as respostas sem revalidar
+                return [
+                    ForecastResponse.model_construct(
+                        forecast_date=forecast_date,
+                        predicted_net_profit=predicted_net_profit,
+                        lower_bound=lower_bound,
+                        upper_bound=upper_bound,
+                        confidence_interval=upper_bound - lower_bound
                     )
-                    forecasts.append(response)
+                    for forecast_date, predicted_net_profit, lower_bound, upper_bound in results
+                ]
                 
-                return forecasts
+            except Exception as e:
+                logger.error("Erro ao buscar previsões: %s", e)
+                raise
+    
+    def get_forecast_stats(self) -> Tuple[Optional[date], int]:
+        """
+        Retorna a data da última previsão e quantas previsões são futuras,
+        com uma única consulta agregada (sem carregar as previsões)
+        Usado apenas pelo scheduler
+        """
+        with Session(engine) as session:
+            try:
+                latest_date, future_count = session.exec(
+                    select(
+                        func.max(ProfitForecast.forecast_date),
+                        func.count().filter(ProfitForecast.forecast_date > date.today())
+                    )
+                ).one()
+                return latest_date, future_count
                 
             except Exception as e:
-                logger.error(f"Erro ao buscar previsões: {e}")
+                logger.error("Erro ao buscar estatísticas das previsões: %s", e)
                 raise
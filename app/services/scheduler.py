@@ -1,62 +1,240 @@
 import joblib
+import numpy as np
 import asyncio
 import re
 import unicodedata
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import time
 import re
 from collections import Counter
-from typing import List, Tuple
-import nltk
-from nltk.corpus import stopwords
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, List, Sequence, Tuple
 
+from sqlalchemy import Row, func, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Session, select, delete
 from database.db_connect import engine
-from model.models import Feedback, Word_Frequency, SentimentEnum
+from model.models import Feedback, Word_Count, Word_Frequency, SentimentEnum
+from services.pt_stopwords import PT_STOPWORDS
 
 import traceback
+import threading
+import queue
 import os
 
-# Download stopwords if not already downloaded
-try:
-    stopwords.words("portuguese")
-except LookupError:
-    nltk.download('stopwords')
+# Stopwords do NLTK já congeladas em services.pt_stopwords (sem ler nem baixar o corpus),
+# compartilhadas por todas as instâncias
+STOPWORDS_PT = PT_STOPWORDS | {'pra', 'pro', 'aqui', 'né', 'tá', 'vc', 'voce'}
 
 # --- CONFIGURAÇÕES ---
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "../ai_model/sentiment_model.joblib")
 MODEL_PATH = os.path.abspath(MODEL_PATH)
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('ml_scheduler.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Listener da fila de log, ativo entre setup_scheduler_logging() e shutdown_scheduler_logging()
+log_listener = None
+
+def setup_scheduler_logging():
+    """
+    Configura o log do scheduler (arquivo ml_scheduler.log e console) no logger deste
+    módulo, sem alterar o logging raiz. As chamadas de log só enfileiram o registro;
+    a escrita acontece em uma thread própria (QueueListener), fora dos jobs e do event loop.
+    Chamado no startup da aplicação; importar o módulo não configura nada.
+    """
+    global log_listener
+    if log_listener is not None:
+        return
+    
+    log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    log_handlers = [logging.FileHandler('ml_scheduler.log'), logging.StreamHandler()]
+    for log_handler in log_handlers:
+        log_handler.setFormatter(log_formatter)
+    
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+    log_listener.start()
+    
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False  # Os handlers do listener já escrevem no console
+
+def shutdown_scheduler_logging():
+    """Escreve os registros pendentes e encerra a thread de log (no shutdown da aplicação)."""
+    global log_listener
+    if log_listener is None:
+        return
+    
+    log_listener.stop()
+    for log_handler in log_listener.handlers:
+        log_handler.close()
+    for log_handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(log_handler)
+    logger.propagate = True
+    log_listener = None
+
+# Feedbacks classificados (e gravados) por lote
+CLASSIFY_BATCH_SIZE = 512
+
+# Máximo de ids por UPDATE ... WHERE id IN (...) ao gravar os sentimentos
+UPDATE_BATCH_SIZE = 500
+
+# Rótulos do modelo para os sentimentos gravados no banco
+SENTIMENT_BY_LABEL = {
+    'positive': SentimentEnum.positive,
+    'negative': SentimentEnum.negative,
+    'neutral': SentimentEnum.neutral,
+}
+
+# Gírias e expressões comuns em uma única alternância (mesmos padrões do treinamento):
+# o texto é percorrido uma vez e o grupo que casou define a substituição
+GIRIA_GROUPS = {
+    'bom': r'massa|top|show|arretado',
+    'ruim': r'aff|vish',
+    'riso': r'rs|kkk+|haha+',  # Remove risos
+    'voce': r'vc',
+    'para': r'pra|pro',
+    'nao_e': r'ne',
+    'esta': r'ta'
+}
+GIRIA_REPLACEMENTS = {
+    'bom': 'bom',
+    'ruim': 'ruim',
+    'riso': '',
+    'voce': 'voce',
+    'para': 'para',
+    'nao_e': 'nao e',
+    'esta': 'esta'
+}
+# As fronteiras de palavra (\b) ficam fora da alternação, compartilhadas por todos os grupos:
+# o motor testa a fronteira uma vez por posição em vez de uma vez por alternativa
+GIRIA_RE = re.compile(r'\b(?:' + '|'.join(f'(?P<{nome}>{padrao})' for nome, padrao in GIRIA_GROUPS.items()) + r')\b')
+
+def replace_giria(match: re.Match) -> str:
+    return GIRIA_REPLACEMENTS[match.lastgroup]
+
+# Tabela de remoção de acentos (a mesma do treinamento): mapeia cada letra latina
+# acentuada (U+00C0-U+024F) para sua letra base e descarta marcas combinantes soltas,
+# em uma única chamada str.translate em vez de decompor com NFD e filtrar caractere a
+# caractere; os demais caracteres acentuados ficam para strip_combining_marks
+ACCENT_TABLE = {
+    codigo: unicodedata.normalize('NFD', chr(codigo))[0]
+    for codigo in range(0x00C0, 0x0250)
+    if unicodedata.normalize('NFD', chr(codigo)) != chr(codigo)
+}
+ACCENT_TABLE.update(dict.fromkeys(range(0x0300, 0x0370)))
+
+def strip_combining_marks(text: str) -> str:
+    """Caminho geral da remoção de acentos: decompõe com NFD e descarta as marcas (categoria Mn)."""
+    return ''.join(char for char in unicodedata.normalize('NFD', text) if unicodedata.category(char) != 'Mn')
+
+# Demais padrões da normalização, compilados uma única vez
+PUNCT_RE = re.compile(r'[^\w\s.!?,-]')
+MULTI_PUNCT_RE = re.compile(r'([.!?])\1+')  # '..', '!!!', '??' -> um único sinal
+ISOLATED_NUMBER_RE = re.compile(r'\b\d+\b(?!\w)')
+
+# Tamanho dos caches de normalização (textos) e de stemming (palavras)
+NORMALIZE_CACHE_SIZE = 20000
+STEM_CACHE_SIZE = 50000
+
+# Máximo de textos normalizados com as probabilidades do modelo guardadas entre execuções
+PROBABILITY_CACHE_SIZE = 100000
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para predição (mesma função usada no treinamento).
+    Função pura: o resultado é memorizado por texto e reaproveitado entre a
+    classificação e a contagem de palavras.
+    """
+    # Converte para minúsculas
+    text = text.lower()
+    
+    # Remove acentos mantendo caracteres especiais do português
+    # (texto só ASCII não tem acentos: dispensa a tradução). A tabela cobre as letras
+    # latinas acentuadas; o que sobrar fora do ASCII (ex.: 'ạ', 'ά', 'ẽ') passa pelo
+    # caminho geral NFD + remoção das marcas, com o mesmo resultado de antes da tabela
+    if not text.isascii():
+        text = text.translate(ACCENT_TABLE)
+        if not text.isascii():
+            text = strip_combining_marks(text)
+    
+    # Padroniza gírias e expressões comuns
+    text = GIRIA_RE.sub(replace_giria, text)
+    
+    # Remove pontuação excessiva (mantém apenas . , ! ?)
+    text = PUNCT_RE.sub(' ', text)
+    
+    # Normaliza pontuação repetida
+    text = MULTI_PUNCT_RE.sub(r'\1', text)
+    
+    # Remove números isolados
+    text = ISOLATED_NUMBER_RE.sub('', text)
+    
+    # Normaliza espaços múltiplos e remove espaços no início e fim
+    # (split/join equivale a substituir r'\s+' por ' ' e aplicar strip, em uma única passada)
+    return ' '.join(text.split())
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def simple_stem(word: str) -> str:
+    """Reduz plurais e advérbios comuns à forma base (resultado memorizado por palavra)."""
+    # Corrigir plurais comuns com 'es' no final
+    if word.endswith('ões'):
+        return word[:-3] + 'ão'  # avaliações -> avaliação
+    elif word.endswith('ães'):
+        return word[:-3] + 'ão'  # refrigerações -> refrigeração
+    elif word.endswith('es') and len(word) > 4:
+        return word[:-2]         # Fallback simples que remove 'es' mas cuidado com casos irregulares
+    elif word.endswith('s') and len(word) > 4:
+        return word[:-1]        # instrutoras -> instrutora, equipamentos -> equipamento
+    elif word.endswith('mente'):
+        return word[:-5]
+    elif word.endswith('ções'):
+        return word[:-4] + 'ção'
+    return word
+
 class MLSentimentScheduler:
     def __init__(self):
         """Inicializa o scheduler e carrega o modelo uma única vez."""
         logger.info(f"Carregando modelo de '{MODEL_PATH}'...")
         try:
-            self.sentiment_model = joblib.load(MODEL_PATH)
+            # Arrays do pipeline mapeados em memória (somente leitura), sem cópia para a RAM
+            self.sentiment_model = joblib.load(MODEL_PATH, mmap_mode='r')
             logger.info("Modelo carregado com sucesso.")
         except FileNotFoundError:
             logger.error(f"ERRO: Modelo não encontrado em '{MODEL_PATH}'")
             raise
         
-        self.stopwords_pt = set(stopwords.words("portuguese"))
-        self.stopwords_pt.update(['pra', 'pro', 'aqui', 'né', 'tá', 'vc', 'voce'])
+        # Sentimento de cada classe do modelo, na ordem de classes_, decodificado uma
+        # única vez (remove aspas se houver); rótulos desconhecidos viram neutral
+        labels = np.char.lower(np.char.strip(np.asarray(self.sentiment_model.classes_).astype(str), '"')).tolist()
+        for label in labels:
+            if label not in SENTIMENT_BY_LABEL:
+                logger.warning("Rótulo desconhecido no modelo: %s -> usando neutral", label)
+        self.class_sentiments = [SENTIMENT_BY_LABEL.get(label, SentimentEnum.neutral) for label in labels]
+        
+        # Probabilidades já calculadas por texto normalizado (válidas para este modelo):
+        # textos repetidos em execuções seguintes não passam de novo pelo pipeline.
+        # O job pode rodar pelo agendador e pela rota de testes, daí o lock
+        self.probability_cache = {}
+        self.probability_cache_lock = threading.Lock()
+        
+        # Uma execução do job por vez neste processo (agendador e rota de testes)
+        self.job_lock = threading.Lock()
+        
+        # Conjuntos imutáveis, consultados a cada palavra
+        self.stopwords_pt = STOPWORDS_PT
 
         # Stopwords específicas para o domínio de academia
-        self.domain_stopwords = {
+        self.domain_stopwords = frozenset({
             # Temporal e lugar
             'hoje', 'ontem', 'amanhã', 'agora', 'sempre', 'antes', 'depois',
             'aqui', 'lá', 'ali', 'cá', 'toda', 'todo', 'dias', 'vezes',
@@ -69,10 +247,10 @@ class MLSentimentScheduler:
             'adoro', 'adorável', 'gosto', 'gostei', 'amo', 'incrível', 'amei', 'amei!', 'massa', 'top', 'show', 'perfeito',
 
             # Genéricos e pronomes
-            'algo', 'alguém', 'coisa', 'tipo', 'gente', 'ninguém', 'nada', 'tudo', 'isso', 'aquilo', 'esse', 'essa', 'isso', 'aquela', 'aquele',
+            'algo', 'alguém', 'coisa', 'tipo', 'gente', 'ninguém', 'isso', 'aquilo', 'esse', 'essa', 'aquela', 'aquele',
 
             # Verbos comuns (que sozinhos não indicam sentimento)
-            'ser', 'estar', 'ter', 'foi', 'vai', 'tá', 'era', 'fica', 'ficar', 'parece', 'tem', 'deu', 'dá', 'vai', 'estava', 'está',
+            'ser', 'estar', 'ter', 'foi', 'vai', 'tá', 'era', 'fica', 'ficar', 'parece', 'tem', 'deu', 'dá', 'estava', 'está',
 
             # Interjeições e expressões informais
             'ufa', 'kkk', 'rs', 'haha', 'eh', 'ah', 'ai', 'eita', 'ixi', 'aff', 'hum', 'nossa', 'vish',
@@ -82,229 +260,321 @@ class MLSentimentScheduler:
 
             # Vocativos e termos de atendimento
             'vc', 'você', 'voce', 'obrigado', 'obrigada', 'valeu', 'atendimento', 'cliente', 'pessoal',
-        }
+        })
+
+        # União das duas listas: uma única consulta por palavra na contagem
+        self.all_stopwords = self.stopwords_pt | self.domain_stopwords
 
+        # Regex de extração de palavras compilada uma única vez (textos já normalizados, sem acentos)
+        self._word_re = re.compile(r'\b[a-z]{3,}\b')
 
-        # Inicializa o scheduler
-        self.scheduler = AsyncIOScheduler()
+        # Inicializa o scheduler: os jobs (síncronos e pesados em CPU) rodam em uma
+        # thread dedicada, sem bloquear o event loop das requisições HTTP
+        self.scheduler = AsyncIOScheduler(executors={'default': ThreadPoolExecutor(max_workers=1)})
 
     def normalize_text(self, text: str) -> str:
         """
         Normaliza texto para predição (mesma função usada no treinamento).
         """
-        # Converte para minúsculas
-        text = text.lower()
-        
-        # Remove acentos mantendo caracteres especiais do português
-        text = unicodedata.normalize('NFD', text)
-        text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-        
-        # Padroniza gírias e expressões comuns
-        girias_map = {
-            r'\bmassa\b': 'bom',
-            r'\btop\b': 'bom', 
-            r'\bshow\b': 'bom',
-            r'\barretado\b': 'bom',
-            r'\baff\b': 'ruim',
-            r'\bvish\b': 'ruim',
-            r'\brs\b': '',  # Remove risos
-            r'\bkkk+\b': '',  # Remove risos
-            r'\bhaha+\b': '',  # Remove risos
-            r'\bvc\b': 'voce',
-            r'\bpra\b': 'para',
-            r'\bpro\b': 'para',
-            r'\bne\b': 'nao e',
-            r'\bta\b': 'esta'
-        }
-        
-        for padrao, substituicao in girias_map.items():
-            text = re.sub(padrao, substituicao, text)
-        
-        # Remove pontuação excessiva (mantém apenas . , ! ?)
-        text = re.sub(r'[^\w\s.!?,-]', ' ', text)
-        
-        # Normaliza pontuação repetida
-        text = re.sub(r'[.]{2,}', '.', text)
-        text = re.sub(r'[!]{2,}', '!', text)
-        text = re.sub(r'[?]{2,}', '?', text)
-        
-        # Remove números isolados
-        text = re.sub(r'\b\d+\b(?!\w)', '', text)
-        
-        # Normaliza espaços múltiplos
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove espaços no início e fim
-        text = text.strip()
-        
-        return text
+        return normalize_text(text)
 
     def simple_stem(self, word: str) -> str:
-        # Corrigir plurais comuns com 'es' no final
-        if word.endswith('ões'):
-            return word[:-3] + 'ão'  # avaliações -> avaliação
-        elif word.endswith('ães'):
-            return word[:-3] + 'ão'  # refrigerações -> refrigeração
-        elif word.endswith('es') and len(word) > 4:
-            return word[:-2]         # Fallback simples que remove 'es' mas cuidado com casos irregulares
-        elif word.endswith('s') and len(word) > 4:
-            return word[:-1]        # instrutoras -> instrutora, equipamentos -> equipamento
-        elif word.endswith('mente'):
-            return word[:-5]
-        elif word.endswith('ções'):
-            return word[:-4] + 'ção'
-        return word
-
-    def get_most_common_words(self, texts: List[str], top_n: int = 10) -> List[Tuple[str, int]]:
+        return simple_stem(word)
+
+    def get_most_common_words(self, texts: Iterable[str], top_n: int = 10) -> List[Tuple[str, int]]:
         """Extrai as palavras mais comuns usando Bag-of-Words com normalização consistente."""
-        if not texts:
-            return []
-        
-        # Normaliza todos os textos usando a mesma função do modelo
-        normalized_texts = [self.normalize_text(text) for text in texts]
-        full_text = ' '.join(normalized_texts)
+        return self.count_words((text, 1) for text in texts).most_common(top_n)
+
+    def count_words(self, weighted_texts: Iterable[Tuple[str, int]]) -> Counter:
+        """Conta as palavras de pares (texto, ocorrências), tokenizando cada texto distinto uma única vez."""
+        raw_counts = Counter()
+        find_words = self._word_re.findall
+        
+        # Conta texto a texto, sem concatenar todos em uma única string
+        for text, occurrences in weighted_texts:
+            # Normaliza usando a mesma função do modelo e extrai palavras de pelo menos 3 caracteres
+            words = find_words(normalize_text(text))
+            if occurrences == 1:
+                raw_counts.update(words)  # Contagem feita em C pelo Counter
+            else:
+                for word in words:
+                    raw_counts[word] += occurrences
         
-        # Extrai palavras de pelo menos 3 caracteres (já normalizadas)
-        words = re.findall(r'\b[a-z]{3,}\b', full_text)
+        # Stopwords e stemming só uma vez por palavra distinta, não a cada ocorrência
+        all_stopwords = self.all_stopwords
+        word_counts = Counter()
+        for word, frequency in raw_counts.items():
+            if word not in all_stopwords:
+                word_counts[simple_stem(word)] += frequency
         
-        # Filtra stopwords e aplica stemming
-        filtered_words = [
-            self.simple_stem(word) for word in words
-            if word not in self.stopwords_pt and word not in self.domain_stopwords
-        ]
-        
-        word_counts = Counter(filtered_words)
-        return word_counts.most_common(top_n)
+        return word_counts
 
     def classify_feedbacks(self, session: Session) -> int:
-        """Classifica feedbacks pendentes usando o modelo ML."""
-        statement = select(Feedback).where(Feedback.sentiment == SentimentEnum.no_analyzed)
-        feedbacks_para_processar = session.exec(statement).all()
-
-        if not feedbacks_para_processar:
-            logger.info("Nenhum feedback novo para classificar.")
-            return 0
-
-        logger.info(f"Classificando {len(feedbacks_para_processar)} novos feedbacks...")
-        
-        # Normaliza os textos antes da predição
-        texts = [self.normalize_text(feedback.text) for feedback in feedbacks_para_processar]
-        
-        # Processa em lotes para melhor performance
-        predictions = self.sentiment_model.predict(texts)
-        
-        # Obter probabilidades para logging de confiança
-        prediction_probabilities = self.sentiment_model.predict_proba(texts)
+        """Classifica feedbacks pendentes usando o modelo ML, em lotes de CLASSIFY_BATCH_SIZE."""
+        # Cada lote gravado deixa de ser 'no_analyzed', então a mesma consulta
+        # sempre devolve o próximo lote pendente (sem cursor aberto entre commits)
+        # Só id e texto: linhas leves, sem instanciar objetos ORM nem o identity map.
+        # No PostgreSQL, FOR UPDATE SKIP LOCKED faz outro worker pular o lote já
+        # selecionado aqui (no SQLite a cláusula é omitida)
+        statement = (
+            select(Feedback.id, Feedback.text)
+            .where(Feedback.sentiment == SentimentEnum.no_analyzed)
+            .limit(CLASSIFY_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
         
-        # Contar predições por classe para logging
-        prediction_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-        confidence_scores = []
+        sentiment_counts = Counter()
+        confidence_sum = 0.0
+        processed_count = 0
         
-        for feedback, prediction, probabilities in zip(feedbacks_para_processar, predictions, prediction_probabilities):
-            # Mapeia predições do modelo (remove aspas se houver)
-            prediction_str = str(prediction).strip('"').lower()
+        while True:
+            feedbacks_para_processar = session.exec(statement).all()
+            if not feedbacks_para_processar:
+                break
             
-            # Calcula a confiança (probabilidade máxima)
-            max_confidence = max(probabilities)
-            confidence_scores.append(max_confidence)
+            logger.info(f"Classificando lote de {len(feedbacks_para_processar)} feedbacks...")
             
-            if prediction_str == 'positive':
-                feedback.sentiment = SentimentEnum.positive
-                prediction_counts['positive'] += 1
-            elif prediction_str == 'negative':
-                feedback.sentiment = SentimentEnum.negative
-                prediction_counts['negative'] += 1
-            elif prediction_str == 'neutral':
-                feedback.sentiment = SentimentEnum.neutral
-                prediction_counts['neutral'] += 1
-            else:
-                # Fallback
-                feedback.sentiment = SentimentEnum.neutral
-                prediction_counts['neutral'] += 1
-                logger.warning(f"Predição desconhecida: {prediction} -> usando neutral")
+            batch_counts, confidences = self.classify_batch(session, feedbacks_para_processar)
+            
+            # Commit por lote: o progresso fica visível e um backlog grande não vira
+            # uma única transação
+            session.commit()
             
-            session.add(feedback)
+            sentiment_counts.update(batch_counts)
+            confidence_sum += float(confidences.sum())
+            processed_count += len(confidences)
+
+        if not processed_count:
+            logger.info("Nenhum feedback novo para classificar.")
+            return 0
         
-        session.commit()
+        # Contar predições por classe e calcular a confiança (probabilidade máxima) para logging
+        prediction_counts = {sentiment.value: sentiment_counts[sentiment] for sentiment in SENTIMENT_BY_LABEL.values()}
         
         # Log estatísticas resumidas
-        avg_confidence = sum(confidence_scores) / len(confidence_scores)
+        avg_confidence = confidence_sum / processed_count
         
         logger.info(f"Classificacao: {prediction_counts['positive']} positivos, {prediction_counts['negative']} negativos, {prediction_counts['neutral']} neutros")
         logger.info(f"Confianca media: {avg_confidence:.3f}")
         
         logger.info("Classificacao concluida e salva no banco.")
-        return len(feedbacks_para_processar)
+        return processed_count
+
+    def classify_batch(self, session: Session, feedbacks_para_processar: Sequence[Row]) -> Tuple[Counter, np.ndarray]:
+        """
+        Prevê e grava o sentimento de um lote de feedbacks; retorna a contagem por
+        sentimento e as confianças dos feedbacks efetivamente gravados por esta execução.
+        """
+        # Normaliza os textos antes da predição
+        texts = [normalize_text(feedback.text) for feedback in feedbacks_para_processar]
+        
+        # Textos repetidos passam pelo modelo uma única vez; o resultado é expandido
+        # de volta para cada feedback pelo índice inverso
+        unique_texts, inverse = np.unique(texts, return_inverse=True)
+        
+        # Uma única passada pelo pipeline: as probabilidades dão a classe (argmax,
+        # o mesmo critério do predict) e a confiança usada no logging
+        probabilities = self.predict_probabilities(unique_texts)
+        class_indexes = probabilities.argmax(axis=1)[inverse]
+        confidences = probabilities.max(axis=1)[inverse]
+        
+        # Contagem por classe e separação das linhas (id, texto) por máscara, sem laço
+        # Python por feedback; classes com o mesmo sentimento se somam
+        class_counts = np.bincount(class_indexes, minlength=len(self.class_sentiments))
+        rows = np.array(feedbacks_para_processar, dtype=object)
+        
+        # Agrupa os ids por sentimento previsto: um UPDATE ... WHERE id IN (...) por
+        # sentimento (em blocos de UPDATE_BATCH_SIZE ids), em vez de um UPDATE por feedback
+        batch_counts = Counter()
+        ids_by_sentiment = {}
+        texts_by_sentiment = {}
+        for class_index in np.flatnonzero(class_counts):
+            sentiment = self.class_sentiments[class_index]
+            class_rows = rows[class_indexes == class_index]
+            batch_counts[sentiment] += int(class_counts[class_index])
+            ids_by_sentiment.setdefault(sentiment, []).extend(class_rows[:, 0].tolist())
+            texts_by_sentiment.setdefault(sentiment, []).extend(class_rows[:, 1].tolist())
+        
+        # Só atualiza feedbacks que ainda estão pendentes: se outra execução já gravou
+        # algum deles, o RETURNING não o devolve e suas palavras não são contadas de novo
+        claimed_ids = set()
+        for sentiment, ids in ids_by_sentiment.items():
+            for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+                claimed_ids.update(session.scalars(
+                    update(Feedback)
+                    .where(
+                        Feedback.id.in_(ids[start:start + UPDATE_BATCH_SIZE]),
+                        Feedback.sentiment == SentimentEnum.no_analyzed
+                    )
+                    .values(sentiment=sentiment)
+                    .returning(Feedback.id)
+                    .execution_options(synchronize_session=False)
+                ))
+        
+        if len(claimed_ids) < len(rows):
+            logger.info("%s feedbacks do lote já classificados por outra execucao", len(rows) - len(claimed_ids))
+            claimed_mask = np.array([row_id in claimed_ids for row_id in rows[:, 0]], dtype=bool)
+            confidences = confidences[claimed_mask]
+            batch_counts = Counter()
+            texts_by_sentiment = {}
+            for class_index, text in zip(class_indexes[claimed_mask].tolist(), rows[claimed_mask, 1].tolist()):
+                sentiment = self.class_sentiments[class_index]
+                batch_counts[sentiment] += 1
+                texts_by_sentiment.setdefault(sentiment, []).append(text)
+        
+        # Soma as palavras do lote às contagens acumuladas, na mesma transação do UPDATE
+        self.add_word_counts(session, {
+            sentiment: self.count_words((text, 1) for text in texts)
+            for sentiment, texts in texts_by_sentiment.items()
+        })
+        
+        return batch_counts, confidences
+
+    def predict_probabilities(self, texts: np.ndarray) -> np.ndarray:
+        """Probabilidades do modelo para textos normalizados distintos, reaproveitando as já calculadas."""
+        texts = texts.tolist()
+        with self.probability_cache_lock:
+            probabilities = [self.probability_cache.get(text) for text in texts]
+        
+        # Só os textos ainda não vistos vão para o pipeline, todos em uma única chamada
+        missing = [position for position, row in enumerate(probabilities) if row is None]
+        if missing:
+            computed = self.sentiment_model.predict_proba([texts[position] for position in missing])
+            with self.probability_cache_lock:
+                for position, row in zip(missing, computed):
+                    probabilities[position] = row
+                    self.probability_cache[texts[position]] = row
+                
+                # Cache cheio: descarta os textos inseridos há mais tempo
+                while len(self.probability_cache) > PROBABILITY_CACHE_SIZE:
+                    del self.probability_cache[next(iter(self.probability_cache))]
+        
+        return np.vstack(probabilities)
+
+    def add_word_counts(self, session: Session, word_counts: Dict[SentimentEnum, Counter], replace: bool = False):
+        """
+        Soma contagens de palavras em Word_Count (INSERT ... ON CONFLICT DO UPDATE).
+        Com replace=True a contagem existente é substituída em vez de somada.
+        """
+        rows = [
+            {"sentiment": sentiment, "word": word, "frequency": frequency}
+            for sentiment, counts in word_counts.items()
+            for word, frequency in counts.items()
+        ]
+        if not rows:
+            return
+        
+        dialect_insert = postgresql_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        statement = dialect_insert(Word_Count)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Word_Count.sentiment, Word_Count.word],
+            set_={"frequency": statement.excluded.frequency if replace else Word_Count.frequency + statement.excluded.frequency}
+        )
+        session.execute(statement, rows)
+
+    def rebuild_word_counts(self, session: Session) -> bool:
+        """Recalcula Word_Count a partir de todos os feedbacks já classificados."""
+        session.execute(delete(Word_Count))
+        
+        # Uma única consulta agrupada pelo banco: cada texto distinto chega uma vez,
+        # com o número de ocorrências, para todos os sentimentos de uma só vez
+        statement = (
+            select(Feedback.sentiment, Feedback.text, func.count())
+            .where(
+                Feedback.sentiment != SentimentEnum.no_analyzed,
+                Feedback.text.is_not(None),
+                Feedback.text != ""
+            )
+            .group_by(Feedback.sentiment, Feedback.text)
+            .order_by(Feedback.sentiment)
+            .execution_options(yield_per=1000)
+        )
+        word_counts = {
+            sentiment: self.count_words((text, occurrences) for _, text, occurrences in rows)
+            for sentiment, rows in groupby(session.exec(statement), key=itemgetter(0))
+        }
+        if not word_counts:
+            return False
+        
+        # Substitui em vez de somar: um recálculo simultâneo em outro worker não duplica as contagens
+        self.add_word_counts(session, word_counts, replace=True)
+        logger.info(f"Contagem de palavras recalculada para {len(word_counts)} sentimentos.")
+        return True
 
     def update_word_frequency(self, session: Session):
-        """Atualiza a tabela de frequência de palavras."""
+        """Atualiza a tabela de frequência de palavras a partir das contagens acumuladas."""
         
         # Limpa dados antigos
         session.execute(delete(Word_Frequency))
         
-        total_words_inserted = 0
-        
-        for sentiment in SentimentEnum:
-            # Busca textos do sentiment específico
-            statement = select(Feedback.text).where(Feedback.sentiment == sentiment)
-            textos = [text for text in session.exec(statement).all() if text]
-            
-            if not textos:
-                continue
-            
-            # Calcula palavras mais comuns
-            common_words = self.get_most_common_words(textos, top_n=10)
-            
-            if common_words:
-                
-                # Insere na tabela
-                for word, frequency in common_words:
-                    wf = Word_Frequency(
-                        word=word,
-                        sentiment=sentiment,
-                        frequency=frequency
-                    )
-                    session.add(wf)
-                    total_words_inserted += 1
-        
-        session.commit()
-        logger.info(f"Palavras atualizadas: {total_words_inserted} inseridas.")
+        # Top 10 de cada sentimento direto de Word_Count, sem reler os feedbacks
+        word_frequency_rows = []
+        for sentiment in SENTIMENT_BY_LABEL.values():
+            statement = (
+                select(Word_Count.word, Word_Count.frequency)
+                .where(Word_Count.sentiment == sentiment)
+                .order_by(Word_Count.frequency.desc(), Word_Count.word)
+                .limit(10)
+            )
+            word_frequency_rows.extend(
+                {"word": word, "sentiment": sentiment, "frequency": frequency}
+                for word, frequency in session.exec(statement)
+            )
+        
+        # Insere na tabela todas as palavras, de todos os sentimentos, em um único lote
+        if word_frequency_rows:
+            session.bulk_insert_mappings(Word_Frequency, word_frequency_rows)
+        
+        logger.info(f"Palavras atualizadas: {len(word_frequency_rows)} inseridas.")
 
     def run_analysis_job(self):
         """Executa o job completo de análise."""
-        start_time = datetime.now()
-        logger.info(f"Executando analise de sentimentos...")
-        
-        try:
-            with Session(engine) as session:
-                # Classifica novos feedbacks
-                processed_count = self.classify_feedbacks(session)
-                
-                # Atualiza frequência de palavras se novos feedbacks chegaram
-                if processed_count > 0:
-                    self.update_word_frequency(session)
-                
-                end_time = datetime.now()
-                duration = (end_time - start_time).total_seconds()
-                
-                logger.info(f"Job concluido: {processed_count} feedbacks em {duration:.2f}s")
-                
-        except Exception as e:
-            logger.error(f"ERRO no job: {e}")
-            traceback.print_exc() # mostra stack trace completo
+        # Execuções sobrepostas (agendador e rota de testes) esperam a anterior terminar
+        with self.job_lock:
+            start_time = datetime.now()
+            logger.info(f"Executando analise de sentimentos...")
+            
+            try:
+                with Session(engine) as session:
+                    # Sem contagens acumuladas (primeira execução ou dados recriados), recalcula
+                    # a partir dos feedbacks já classificados antes de somar os novos
+                    counts_rebuilt = False
+                    if session.exec(select(Word_Count.word).limit(1)).first() is None:
+                        counts_rebuilt = self.rebuild_word_counts(session)
+                        session.commit()
+                    
+                    # Classifica novos feedbacks
+                    processed_count = self.classify_feedbacks(session)
+                    
+                    # Atualiza frequência de palavras se novos feedbacks chegaram
+                    if processed_count > 0 or counts_rebuilt:
+                        self.update_word_frequency(session)
+                        
+                        # Top de palavras reescrito em uma única transação
+                        session.commit()
+                    
+                    end_time = datetime.now()
+                    duration = (end_time - start_time).total_seconds()
+                    
+                    logger.info(f"Job concluido: {processed_count} feedbacks em {duration:.2f}s")
+            
+            except Exception as e:
+                logger.error(f"ERRO no job: {e}")
+                traceback.print_exc() # mostra stack trace completo
 
     def start_scheduler(self):
         """Inicia o scheduler."""
-        # Executa imediatamente na inicialização
-        self.run_analysis_job()
-        
-        # Agenda para rodar a cada 5 min
+        # Agenda para rodar a cada 5 min, com a primeira execução imediata
+        # (na thread do executor, não durante o startup da aplicação)
         self.scheduler.add_job(
             func=self.run_analysis_job,
             trigger=IntervalTrigger(minutes=5), # Periodo curto para demonstração
+            next_run_time=datetime.now(),
             id='sentiment_analysis_job',
             name='Analise de Sentimentos ML',
-            replace_existing=True
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
         )
         
         self.scheduler.start()
@@ -318,12 +588,15 @@ class MLSentimentScheduler:
 
 # Instância global
 scheduler_instance = None
+scheduler_lock = threading.Lock()  # A validação pode pedir o scheduler de outra thread
 
 def get_scheduler() -> MLSentimentScheduler:
     """Retorna a instância singleton do scheduler."""
     global scheduler_instance
     if scheduler_instance is None:       # Só carrega o modelo na inicializaçção
-        scheduler_instance = MLSentimentScheduler()
+        with scheduler_lock:
+            if scheduler_instance is None:
+                scheduler_instance = MLSentimentScheduler()
     return scheduler_instance
 
 def start_ml_scheduler():
@@ -340,6 +613,7 @@ def stop_ml_scheduler():
 
 # --- EXECUÇÃO ---
 if __name__ == "__main__":
+    setup_scheduler_logging()
     try:
         scheduler = MLSentimentScheduler()
         scheduler.start_scheduler()
@@ -356,3 +630,4 @@ if __name__ == "__main__":
         print("\nParando scheduler...")
         scheduler.stop_scheduler()
         print("Scheduler finalizado.")
+        shutdown_scheduler_logging()